@@ -0,0 +1,57 @@
+'use strict';
+
+const { cachedText } = require('../lib/ocr');
+const { ENGINES, cachedAnalysis } = require('../lib/analyzer');
+const { parseLanguageCodes } = require('../lib/upload');
+const { cleanupOcrText } = require('../lib/text');
+const { findMatches } = require('../lib/dictionary');
+const { apiHandler } = require('../lib/middleware');
+
+// Cache probe that needs no upload: the client sends the SHA-256 of the
+// image bytes it would POST to /api/pipeline (same ?model=,
+// ?languageCodes=, ?engine=). Replies { hit: false }, or
+// { hit: true, text, matches, analysis } with what the pipeline would have
+// answered; analysis is null when only the OCR result is cached, so the
+// client can send the text to /api/gemini instead of the image. Never
+// calls an upstream.
+
+const HASH_RE = /^[0-9a-f]{64}$/;
+
+module.exports = apiHandler('lookup', async (req, res) => {
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Access-Control-Allow-Methods', 'GET,OPTIONS');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+  res.setHeader('Cache-Control', 'no-store');
+
+  if (req.method === 'OPTIONS') {
+    res.status(204).end();
+    return;
+  }
+
+  if (req.method !== 'GET') {
+    res.status(405).json({ error: 'Method Not Allowed' });
+    return;
+  }
+
+  const query = req.query || Object.fromEntries(new URL(req.url || '/', 'http://localhost').searchParams);
+  const hash = String(query.hash || '').toLowerCase();
+  if (!HASH_RE.test(hash)) {
+    res.status(400).json({ error: 'hash must be a hex SHA-256 digest' });
+    return;
+  }
+  const engine = ENGINES.includes(query.engine) ? query.engine : 'gemini';
+
+  const raw = await cachedText(hash, {
+    model: (query.model || 'page').toString().trim(),
+    languageCodes: parseLanguageCodes(query.languageCodes)
+  });
+  const text = raw === undefined ? '' : cleanupOcrText(raw);
+  if (!text) {
+    res.status(200).json({ hit: false });
+    return;
+  }
+
+  const matches = findMatches(text);
+  const analysis = cachedAnalysis({ text, engine, matches });
+  res.status(200).json({ hit: true, text, matches, analysis });
+});
@@ -0,0 +1,32 @@
+'use strict';
+
+const stats = require('../lib/stats');
+const { statsHandler } = require('../lib/middleware');
+const metrics = require('../lib/metrics');
+require('../lib/ocr');
+require('../lib/gemini');
+require('../lib/timing');
+
+// Prometheus scrape endpoint. In cluster mode the series are summed across
+// workers (lib/stats.js), so one scrape covers the whole server.
+
+module.exports = statsHandler(async (req, res) => {
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Access-Control-Allow-Methods', 'GET,OPTIONS');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+  res.setHeader('Cache-Control', 'no-store');
+
+  if (req.method === 'OPTIONS') {
+    res.status(204).end();
+    return;
+  }
+
+  if (req.method !== 'GET') {
+    res.status(405).json({ error: 'Method Not Allowed' });
+    return;
+  }
+
+  const all = await stats.collectAll();
+  res.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+  res.status(200).send(metrics.render(all.metrics || {}));
+});
@@ -0,0 +1,107 @@
+'use strict';
+
+const { recognizeText } = require('../lib/ocr');
+const { ENGINES, runAnalysis } = require('../lib/analyzer');
+const { readImageUpload, sendUploadError } = require('../lib/upload');
+const { cleanupOcrText } = require('../lib/text');
+const { findMatches } = require('../lib/dictionary');
+const { wantsEventStream, openEventStream } = require('../lib/sse');
+const { current } = require('../lib/timing');
+const { apiHandler } = require('../lib/middleware');
+
+// OCR + cleanup + analysis in one request (?engine= picks the analyzer as
+// for /api/gemini). Replies with { text, matches, analysis } (matches are
+// dictionary hits with offsets into text) or, with ?stream=1 /
+// Accept: text/event-stream, emits `ocr`, a `field` per completed analysis
+// field, `analysis`, `timing` and `done` as each stage finishes (`error` carries the
+// failing stage).
+
+module.exports = apiHandler('pipeline', async (req, res) => {
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Access-Control-Allow-Methods', 'POST,OPTIONS');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+
+  if (req.method === 'OPTIONS') {
+    res.status(204).end();
+    return;
+  }
+
+  if (req.method !== 'POST') {
+    res.status(405).json({ error: 'Method Not Allowed' });
+    return;
+  }
+
+  const query = req.query || Object.fromEntries(new URL(req.url || '/', 'http://localhost').searchParams);
+  const engine = ENGINES.includes(query.engine) ? query.engine : 'gemini';
+  const yandexKey = process.env.YANDEX_API_KEY;
+  const geminiKey = process.env.GEMINI_API_KEY;
+  if (!yandexKey || (!geminiKey && engine !== 'local')) {
+    console.error('[Pipeline] ERROR: YANDEX_API_KEY or GEMINI_API_KEY not set');
+    res.status(500).json({ error: 'API keys are not configured on server' });
+    return;
+  }
+
+  let upload;
+  try {
+    upload = await readImageUpload(req);
+  } catch (e) {
+    sendUploadError(req, res, e);
+    return;
+  }
+
+  const events = wantsEventStream(req) ? openEventStream(res) : null;
+  const fail = (statusCode, body) => {
+    if (events) {
+      events.send('error', body);
+      events.close();
+    } else {
+      if (body.retryAfter) res.setHeader('Retry-After', String(body.retryAfter));
+      res.status(statusCode).json(body);
+    }
+  };
+
+  let text;
+  try {
+    const ocr = await recognizeText(upload, { apiKey: yandexKey });
+    text = cleanupOcrText(ocr.text);
+  } catch (e) {
+    console.error('[Pipeline] OCR error:', e.message);
+    if (e.statusCode === 503) {
+      fail(503, { stage: 'ocr', error: e.message, retryAfter: e.retryAfter });
+      return;
+    }
+    fail(502, e.status
+      ? { stage: 'ocr', error: 'Yandex Vision OCR request failed', status: e.status, details: e.details }
+      : { stage: 'ocr', error: 'Yandex Vision OCR request error', details: e.message });
+    return;
+  }
+
+  if (!text) {
+    fail(400, { stage: 'ocr', error: 'No text could be recognized in image' });
+    return;
+  }
+  const matches = findMatches(text);
+  if (events) events.send('ocr', { text, matches });
+
+  try {
+    const { result } = await runAnalysis(geminiKey, { mode: 'analyze', text, engine, matches }, events
+      ? (key, value) => events.send('field', { key, value })
+      : null);
+    if (events) {
+      events.send('analysis', result);
+      events.send('timing', current().toJSON());
+      events.send('done', {});
+      events.close();
+    } else {
+      res.status(200).json({ text, matches, analysis: result });
+    }
+  } catch (e) {
+    console.error('[Pipeline] Gemini error:', e.message);
+    if (events) {
+      fail(502, { stage: 'analysis', error: e.message, retryAfter: e.retryAfter });
+    } else {
+      // The recognized text is still useful; the client can retry analysis.
+      res.status(200).json({ text, matches, analysis: null, analysisError: e.message, retryAfter: e.retryAfter });
+    }
+  }
+});
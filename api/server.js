@@ -0,0 +1,314 @@
+'use strict';
+
+const cluster = require('cluster');
+const http = require('http');
+const fs = require('fs');
+const path = require('path');
+const { negotiate, isCompressible, addVary } = require('../lib/compress');
+
+// Long-lived alternative to the Vercel runtime. Mounts every handler in
+// api/ the way vercel.json routes them and serves the built site (dist/,
+// from npm run build) or else public/ statically, so module-scope caches
+// and upstream pools survive between requests. Static files are sent
+// precompressed when a .br/.gz sibling exists; nothing is compressed at
+// request time.
+
+const API_DIR = __dirname;
+const STATIC_DIR = staticDir();
+// Content-hashed build output; anything else must be revalidated.
+const IMMUTABLE_PREFIX = '/assets/';
+const IMMUTABLE_CACHE = 'public, max-age=31536000, immutable';
+const REVALIDATE_CACHE = 'no-cache';
+const MAX_BODY_BYTES = Number(process.env.MAX_BODY_BYTES) || 20 * 1024 * 1024;
+const DRAIN_TIMEOUT_MS = Number(process.env.DRAIN_TIMEOUT_MS) || 30000;
+
+const CONTENT_TYPES = {
+  '.html': 'text/html; charset=utf-8',
+  '.js': 'text/javascript; charset=utf-8',
+  '.css': 'text/css; charset=utf-8',
+  '.json': 'application/json; charset=utf-8',
+  '.svg': 'image/svg+xml',
+  '.png': 'image/png',
+  '.jpg': 'image/jpeg',
+  '.ico': 'image/x-icon',
+  '.webmanifest': 'application/manifest+json'
+};
+
+// Content types Vercel parses into req.body before the handler runs. Any
+// other body is left on the request stream for the handler to consume.
+const PARSED_TYPES = ['application/json', 'text/', 'application/x-www-form-urlencoded'];
+
+function loadHandlers() {
+  const handlers = new Map();
+  for (const file of fs.readdirSync(API_DIR)) {
+    if (!file.endsWith('.js') || file.startsWith('_') || file === 'server.js') continue;
+    const name = file.slice(0, -3);
+    handlers.set(name === 'index' ? '' : name, require(path.join(API_DIR, file)));
+  }
+  return handlers;
+}
+
+// An oversized body is left unread rather than destroyed, so the client
+// gets to read the 413; the error is sent with Connection: close.
+function readBody(req, limit) {
+  return new Promise((resolve, reject) => {
+    const tooLarge = () => {
+      const err = new Error('Payload Too Large');
+      err.statusCode = 413;
+      reject(err);
+    };
+    if (Number(req.headers['content-length']) > limit) {
+      tooLarge();
+      return;
+    }
+    const chunks = [];
+    let size = 0;
+    const onData = (chunk) => {
+      size += chunk.length;
+      if (size > limit) {
+        req.removeListener('data', onData);
+        req.pause();
+        tooLarge();
+        return;
+      }
+      chunks.push(chunk);
+    };
+    req.on('data', onData);
+    req.on('end', () => resolve(Buffer.concat(chunks)));
+    req.on('error', reject);
+  });
+}
+
+function parseBody(raw, contentType) {
+  if (!raw.length) return undefined;
+  if (contentType.includes('application/json')) {
+    try {
+      return JSON.parse(raw.toString('utf8'));
+    } catch (e) {
+      const err = new Error('Invalid JSON');
+      err.statusCode = 400;
+      throw err;
+    }
+  }
+  if (contentType.includes('application/x-www-form-urlencoded')) {
+    return Object.fromEntries(new URLSearchParams(raw.toString('utf8')));
+  }
+  return raw.toString('utf8');
+}
+
+function decorateResponse(res) {
+  res.status = (code) => {
+    res.statusCode = code;
+    return res;
+  };
+  res.json = (obj) => {
+    if (!res.getHeader('Content-Type')) {
+      res.setHeader('Content-Type', 'application/json; charset=utf-8');
+    }
+    res.end(JSON.stringify(obj));
+    return res;
+  };
+  res.send = (body) => {
+    if (body !== null && typeof body === 'object' && !Buffer.isBuffer(body)) {
+      return res.json(body);
+    }
+    res.end(body);
+    return res;
+  };
+  return res;
+}
+
+function sendError(res, statusCode, message) {
+  if (res.headersSent) {
+    res.end();
+    return;
+  }
+  res.status(statusCode).json({ error: message });
+}
+
+async function handleApi(handler, req, res, url) {
+  req.query = Object.fromEntries(url.searchParams);
+
+  const contentType = (req.headers['content-type'] || '').toString();
+  if (PARSED_TYPES.some((t) => contentType.includes(t))) {
+    const raw = await readBody(req, MAX_BODY_BYTES);
+    req.body = parseBody(raw, contentType);
+  }
+
+  await handler(req, res);
+}
+
+function staticDir() {
+  if (process.env.STATIC_DIR) return path.resolve(process.env.STATIC_DIR);
+  const dist = path.join(__dirname, '..', 'dist');
+  return fs.existsSync(path.join(dist, 'index.html')) ? dist : path.join(__dirname, '..', 'public');
+}
+
+function resolveStatic(pathname) {
+  let decoded;
+  try {
+    decoded = decodeURIComponent(pathname);
+  } catch (e) {
+    return null;
+  }
+  const file = path.normalize(path.join(STATIC_DIR, decoded));
+  if (!file.startsWith(STATIC_DIR + path.sep)) return null;
+  return file;
+}
+
+function serveStatic(req, res, url) {
+  if (req.method !== 'GET' && req.method !== 'HEAD') {
+    sendError(res, 405, 'Method Not Allowed');
+    return;
+  }
+
+  const immutable = url.pathname.startsWith(IMMUTABLE_PREFIX);
+  let file = resolveStatic(url.pathname);
+  let stat = file && statFile(file);
+  if (!stat && immutable) {
+    // A stale page asking for an old hash must not get HTML back.
+    sendError(res, 404, 'Not Found');
+    return;
+  }
+  if (!stat) {
+    // SPA fallback, same as the catch-all route in vercel.json.
+    file = path.join(STATIC_DIR, 'index.html');
+    stat = statFile(file);
+  }
+  if (!stat) {
+    sendError(res, 404, 'Not Found');
+    return;
+  }
+
+  const contentType = CONTENT_TYPES[path.extname(file)] || 'application/octet-stream';
+  if (isCompressible(contentType)) {
+    addVary(res, 'Accept-Encoding');
+    const variant = precompressed(file, stat, negotiate(req.headers['accept-encoding']));
+    if (variant) {
+      res.setHeader('Content-Encoding', variant.encoding);
+      file = variant.file;
+      stat = variant.stat;
+    }
+  }
+
+  const etag = `W/"${stat.size.toString(16)}-${Math.floor(stat.mtimeMs).toString(16)}"`;
+  res.setHeader('Cache-Control', immutable ? IMMUTABLE_CACHE : REVALIDATE_CACHE);
+  res.setHeader('ETag', etag);
+  res.setHeader('Content-Type', contentType);
+  const ifNoneMatch = (req.headers['if-none-match'] || '').toString();
+  if (ifNoneMatch.split(/\s*,\s*/).includes(etag)) {
+    res.statusCode = 304;
+    res.end();
+    return;
+  }
+
+  res.statusCode = 200;
+  res.setHeader('Content-Length', stat.size);
+  if (req.method === 'HEAD') {
+    res.end();
+    return;
+  }
+  fs.createReadStream(file).on('error', () => res.destroy()).pipe(res);
+}
+
+const VARIANT_EXT = { br: '.br', gzip: '.gz' };
+
+// The build's compressed copy of file for the negotiated encoding, unless
+// it is missing or older than the file itself.
+function precompressed(file, stat, encoding) {
+  if (!encoding) return null;
+  const variantFile = file + VARIANT_EXT[encoding];
+  const variantStat = statFile(variantFile);
+  if (!variantStat || variantStat.mtimeMs < stat.mtimeMs) return null;
+  return { encoding, file: variantFile, stat: variantStat };
+}
+
+function statFile(file) {
+  try {
+    const stat = fs.statSync(file);
+    return stat.isFile() ? stat : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+// While draining, responses close their connection: the head of one that
+// was already in flight when the drain began still goes out with
+// Connection: close, and once it has been sent the now idle keep-alive
+// sockets are closed, so server.close() completes with the last response.
+function trackDrain(server, res) {
+  const writeHead = res.writeHead;
+  res.writeHead = function (...args) {
+    if (server.draining && !res.headersSent) res.setHeader('Connection', 'close');
+    return writeHead.apply(this, args);
+  };
+  res.once('finish', () => {
+    if (server.draining) setImmediate(() => server.closeIdleConnections?.());
+  });
+}
+
+function createServer({ handlers = loadHandlers() } = {}) {
+  const server = http.createServer(async (req, res) => {
+    decorateResponse(res);
+    trackDrain(server, res);
+    const url = new URL(req.url, 'http://localhost');
+    const match = url.pathname.match(/^\/api(?:\/([^/]*))?\/?$/);
+
+    if (!match) {
+      serveStatic(req, res, url);
+      return;
+    }
+
+    const handler = handlers.get(match[1] || '');
+    if (!handler) {
+      sendError(res, 404, 'Not Found');
+      return;
+    }
+
+    try {
+      await handleApi(handler, req, res, url);
+    } catch (e) {
+      if (!e.statusCode) console.error(`[Server] ${req.method} ${url.pathname}:`, e);
+      if (!req.complete && !res.headersSent) res.setHeader('Connection', 'close');
+      sendError(res, e.statusCode || 500, e.statusCode ? e.message : 'Internal Server Error');
+    }
+  });
+  server.draining = false;
+  return server;
+}
+
+function start(port = Number(process.env.PORT) || 3000) {
+  const server = createServer();
+  server.keepAliveTimeout = 65000;
+  server.listen(port, () => {
+    console.log(`[Server] Listening on http://localhost:${port}`);
+  });
+
+  // Stop accepting connections and let in-flight requests finish; keep-alive
+  // clients are told to reconnect elsewhere via Connection: close.
+  const shutdown = () => {
+    if (server.draining) return;
+    server.draining = true;
+    server.close(() => process.exit(0));
+    server.closeIdleConnections?.();
+    setTimeout(() => process.exit(1), DRAIN_TIMEOUT_MS).unref();
+  };
+  process.once('SIGTERM', shutdown);
+  process.once('SIGINT', shutdown);
+  process.on('message', (msg) => {
+    if (msg && msg.type === 'shutdown') shutdown();
+  });
+  return server;
+}
+
+if (require.main === module) {
+  const { workerCount, runCluster } = require('../lib/cluster');
+  const workers = workerCount();
+  if (workers > 1 && cluster.isPrimary) {
+    runCluster({ workers, drainTimeoutMs: DRAIN_TIMEOUT_MS });
+  } else {
+    start();
+  }
+}
+
+module.exports = { createServer, start };
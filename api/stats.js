@@ -0,0 +1,27 @@
+'use strict';
+
+const stats = require('../lib/stats');
+const { statsHandler } = require('../lib/middleware');
+require('../lib/ocr');
+require('../lib/gemini');
+
+module.exports = statsHandler(async (req, res) => {
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Access-Control-Allow-Methods', 'GET,OPTIONS');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+  res.setHeader('Cache-Control', 'no-store');
+
+  if (req.method === 'OPTIONS') {
+    res.status(204).end();
+    return;
+  }
+
+  if (req.method !== 'GET') {
+    res.status(405).json({ error: 'Method Not Allowed' });
+    return;
+  }
+
+  // Series are served in Prometheus format by /api/metrics.
+  const { metrics, ...rest } = await stats.collectAll();
+  res.status(200).json(rest);
+});
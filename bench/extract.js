@@ -0,0 +1,155 @@
+'use strict';
+
+const fs = require('fs');
+const path = require('path');
+const { performance } = require('perf_hooks');
+const { parseArgs } = require('./mock-upstream');
+const { extractText } = require('../lib/layout');
+
+// Micro-benchmark for lib/layout.js on synthetic page-model responses:
+// pages of two-column text, full-width headings and nutrition grids,
+// scaled to the given block counts. Blocks are shuffled, as Yandex does
+// not guarantee reading order. Prints one JSON document with the median
+// time per response and per line; time per line should stay roughly flat
+// as pages grow. Before timing, the layout fixtures
+// (bench/fixtures/layout-*.json) are extracted and compared with their
+// expected text; a mismatch fails the run.
+//
+//   npm run bench:extract -- --blocks 100,1000,10000,50000 --runs 20
+
+const DEFAULTS = {
+  blocks: '100,1000,10000,50000',
+  linesPerBlock: 4,
+  wordsPerLine: 6,
+  runs: 20,
+  seed: 1
+};
+
+const WORDS = ['мука', 'пшеничная', 'сахар', 'масло', 'пальмовое', 'E322', 'лецитин', 'соль', 'молоко', 'сухое', 'крахмал', 'E330'];
+
+function random(seed) {
+  let s = seed >>> 0 || 1;
+  return () => {
+    s ^= s << 13;
+    s ^= s >>> 17;
+    s ^= s << 5;
+    return (s >>> 0) / 4294967296;
+  };
+}
+
+function box(x0, y0, x1, y1) {
+  // Strings, and zeros omitted, as in real responses.
+  const v = (x, y) => {
+    const out = {};
+    if (x) out.x = String(x);
+    if (y) out.y = String(y);
+    return out;
+  };
+  return { vertices: [v(x0, y0), v(x0, y1), v(x1, y1), v(x1, y0)] };
+}
+
+function makeBlock(rand, x0, y0, x1, lineCount, wordsPerLine) {
+  const lines = [];
+  for (let i = 0; i < lineCount; i++) {
+    const words = [];
+    let x = x0;
+    for (let j = 0; j < wordsPerLine; j++) {
+      const text = WORDS[Math.floor(rand() * WORDS.length)];
+      const w = text.length * 9;
+      words.push({ boundingBox: box(x, y0 + i * 24, x + w, y0 + i * 24 + 20), text });
+      x += w + 6;
+    }
+    lines.push({
+      boundingBox: box(x0, y0 + i * 24, x1, y0 + i * 24 + 20),
+      text: words.map((w) => w.text).join(' '),
+      words
+    });
+  }
+  return { boundingBox: box(x0, y0, x1, y0 + lineCount * 24), lines };
+}
+
+// A one-line value cell of a nutrition grid, such as "12,5 г".
+function makeCell(rand, x0, y0, x1) {
+  const text = `${Math.floor(rand() * 100)},${Math.floor(rand() * 10)} г`;
+  const boundingBox = box(x0, y0, x1, y0 + 20);
+  return { boundingBox, lines: [{ boundingBox, text, words: [{ boundingBox, text }] }] };
+}
+
+// Repeats a page pattern down one tall page until `count` blocks exist.
+function makeResponse(count, { linesPerBlock, wordsPerLine, seed }) {
+  const rand = random(seed);
+  const blocks = [];
+  let y = 0;
+  while (blocks.length < count) {
+    blocks.push(makeBlock(rand, 0, y, 1000, 1, wordsPerLine));
+    y += 40;
+    for (let row = 0; row < 3 && blocks.length < count; row++) {
+      blocks.push(makeBlock(rand, 0, y, 480, linesPerBlock, wordsPerLine));
+      if (blocks.length < count) blocks.push(makeBlock(rand, 520, y, 1000, linesPerBlock, wordsPerLine));
+      y += linesPerBlock * 24 + 16;
+    }
+    for (let row = 0; row < 3 && blocks.length < count; row++) {
+      blocks.push(makeBlock(rand, 0, y, 300, 1, 2));
+      if (blocks.length < count) blocks.push(makeCell(rand, 600, y, 700));
+      y += 30;
+    }
+  }
+  for (let i = blocks.length - 1; i > 0; i--) {
+    const j = Math.floor(rand() * (i + 1));
+    [blocks[i], blocks[j]] = [blocks[j], blocks[i]];
+  }
+  return { result: { textAnnotation: { width: '1000', height: String(y), blocks } } };
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.floor(sorted.length / 2)];
+}
+
+function checkFixtures() {
+  const dir = path.join(__dirname, 'fixtures');
+  const checks = [];
+  for (const name of fs.readdirSync(dir).filter((f) => /^layout-.*\.json$/.test(f)).sort()) {
+    const fixture = JSON.parse(fs.readFileSync(path.join(dir, name), 'utf8'));
+    const text = extractText(fixture.response);
+    const ok = text === fixture.expected;
+    checks.push(ok ? { fixture: name, ok } : { fixture: name, ok, expected: fixture.expected, actual: text });
+  }
+  return checks;
+}
+
+function main() {
+  const opts = parseArgs(process.argv.slice(2), DEFAULTS);
+  const checks = checkFixtures();
+  if (checks.some((c) => !c.ok)) {
+    console.log(JSON.stringify({ checks }, null, 2));
+    process.exitCode = 1;
+    return;
+  }
+  const results = [];
+  for (const count of String(opts.blocks).split(',').map(Number)) {
+    const resp = makeResponse(count, opts);
+    const lines = resp.result.textAnnotation.blocks.reduce((n, b) => n + b.lines.length, 0);
+    let chars = 0;
+    // Warm up so the first size is not charged with JIT compilation.
+    for (let i = 0; i < 3; i++) chars = extractText(resp).length;
+    const times = [];
+    for (let i = 0; i < opts.runs; i++) {
+      const start = performance.now();
+      extractText(resp);
+      times.push(performance.now() - start);
+    }
+    const ms = median(times);
+    results.push({
+      blocks: count,
+      lines,
+      responseBytes: Buffer.byteLength(JSON.stringify(resp)),
+      outputChars: chars,
+      medianMs: Number(ms.toFixed(3)),
+      nsPerLine: Math.round((ms * 1e6) / lines)
+    });
+  }
+  console.log(JSON.stringify({ node: process.version, options: opts, checks, results }, null, 2));
+}
+
+main();
@@ -0,0 +1,158 @@
+'use strict';
+
+const fs = require('fs');
+const http = require('http');
+const https = require('https');
+const path = require('path');
+
+// Stand-in for the Yandex Vision OCR and Gemini endpoints, answering with
+// the recorded payloads in bench/fixtures after a configurable delay.
+//
+//   node bench/mock-upstream.js --port 8787 --latency 120 --jitter 40 --error-rate 0.01
+//
+// Point the app at it with YANDEX_OCR_URL=http://127.0.0.1:8787/ocr/v1/recognizeText
+// and GEMINI_MODEL_URL=http://127.0.0.1:8787/v1beta/models/gemini-2.5-flash.
+// --tls-cert/--tls-key serve HTTPS instead (the app then needs
+// NODE_EXTRA_CA_CERTS for a self-signed certificate).
+
+const FIXTURES = path.join(__dirname, 'fixtures');
+const OCR_FIXTURE = fs.readFileSync(path.join(FIXTURES, 'ocr-response.json'));
+const GEMINI_FIXTURE = JSON.parse(fs.readFileSync(path.join(FIXTURES, 'gemini-response.json'), 'utf8'));
+
+const DEFAULTS = {
+  port: 0,
+  host: '127.0.0.1',
+  latency: 100,
+  jitter: 0,
+  errorRate: 0,
+  streamChunks: 8,
+  tlsCert: null,
+  tlsKey: null
+};
+
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+function delay(opts) {
+  return Math.max(0, opts.latency + (Math.random() * 2 - 1) * opts.jitter);
+}
+
+function readBody(req) {
+  return new Promise((resolve, reject) => {
+    const chunks = [];
+    req.on('data', (chunk) => chunks.push(chunk));
+    req.on('end', () => resolve(Buffer.concat(chunks)));
+    req.on('error', reject);
+  });
+}
+
+function sendJson(res, status, body) {
+  const data = Buffer.isBuffer(body) ? body : Buffer.from(JSON.stringify(body));
+  res.writeHead(status, { 'Content-Type': 'application/json; charset=utf-8', 'Content-Length': data.length });
+  res.end(data);
+}
+
+// Splits the fixture answer into `chunks` SSE events the way
+// streamGenerateContent?alt=sse delivers it; the delay is spread over them.
+async function streamGemini(res, opts, total) {
+  res.writeHead(200, { 'Content-Type': 'text/event-stream' });
+  const text = GEMINI_FIXTURE.candidates[0].content.parts[0].text;
+  const size = Math.ceil(text.length / opts.streamChunks);
+  for (let i = 0; i < text.length; i += size) {
+    await sleep(total / opts.streamChunks);
+    const payload = {
+      candidates: [{ content: { parts: [{ text: text.slice(i, i + size) }], role: 'model' }, index: 0 }]
+    };
+    res.write(`data: ${JSON.stringify(payload)}\r\n\r\n`);
+  }
+  res.end();
+}
+
+function createMockUpstream(options = {}) {
+  const opts = { ...DEFAULTS, ...options };
+  const counts = { ocr: 0, generate: 0, stream: 0, errors: 0 };
+
+  const handler = async (req, res) => {
+    const url = new URL(req.url, 'http://mock');
+    await readBody(req);
+    const wait = delay(opts);
+
+    let kind = null;
+    if (req.method === 'POST' && url.pathname === '/ocr/v1/recognizeText') kind = 'ocr';
+    else if (req.method === 'POST' && url.pathname.endsWith(':generateContent')) kind = 'generate';
+    else if (req.method === 'POST' && url.pathname.endsWith(':streamGenerateContent')) kind = 'stream';
+    if (!kind) {
+      sendJson(res, 404, { error: { code: 404, message: 'Not found' } });
+      return;
+    }
+    counts[kind]++;
+
+    if (Math.random() < opts.errorRate) {
+      counts.errors++;
+      await sleep(wait);
+      sendJson(res, 503, { error: { code: 503, message: 'Mock upstream error', status: 'UNAVAILABLE' } });
+      return;
+    }
+
+    if (kind === 'stream') {
+      await streamGemini(res, opts, wait);
+      return;
+    }
+    await sleep(wait);
+    sendJson(res, 200, kind === 'ocr' ? OCR_FIXTURE : GEMINI_FIXTURE);
+  };
+
+  const server = opts.tlsCert && opts.tlsKey
+    ? https.createServer({ cert: fs.readFileSync(opts.tlsCert), key: fs.readFileSync(opts.tlsKey) }, handler)
+    : http.createServer(handler);
+  server.keepAliveTimeout = 60000;
+
+  return {
+    server,
+    counts,
+    listen() {
+      return new Promise((resolve) => {
+        server.listen(opts.port, opts.host, () => {
+          const { port } = server.address();
+          const base = `${opts.tlsCert && opts.tlsKey ? 'https' : 'http'}://${opts.host}:${port}`;
+          resolve({
+            port,
+            ocrUrl: `${base}/ocr/v1/recognizeText`,
+            geminiModelUrl: `${base}/v1beta/models/gemini-2.5-flash`
+          });
+        });
+      });
+    },
+    close() {
+      return new Promise((resolve) => server.close(resolve));
+    }
+  };
+}
+
+// --error-rate 0.05 -> { errorRate: 0.05 }; numeric values are converted.
+function parseArgs(argv, defaults) {
+  const out = { ...defaults };
+  for (let i = 0; i < argv.length; i++) {
+    const m = argv[i].match(/^--([a-z-]+)(?:=(.*))?$/);
+    if (!m) continue;
+    const key = m[1].replace(/-([a-z])/g, (_, c) => c.toUpperCase());
+    const raw = m[2] !== undefined ? m[2] : argv[++i];
+    out[key] = typeof defaults[key] === 'number' ? Number(raw) : raw;
+  }
+  return out;
+}
+
+if (require.main === module) {
+  const mock = createMockUpstream(parseArgs(process.argv.slice(2), DEFAULTS));
+  mock.listen().then((info) => {
+    if (process.send) process.send({ type: 'listening', ...info });
+    else console.log(JSON.stringify(info));
+  });
+  process.on('message', (msg) => {
+    if (msg && msg.type === 'counts') process.send({ type: 'counts', counts: mock.counts });
+  });
+  process.on('SIGTERM', () => mock.close().then(() => process.exit(0)));
+}
+
+module.exports = { createMockUpstream, parseArgs, DEFAULTS };
@@ -0,0 +1,213 @@
+'use strict';
+
+const http = require('http');
+const path = require('path');
+const { fork } = require('child_process');
+const { parseArgs } = require('./mock-upstream');
+
+// Offline load test: starts the mock upstream in a child process, points
+// the handlers at it and drives them through the standalone server at each
+// concurrency level (closed loop: every client sends its next request as
+// soon as the previous one completes). Prints one JSON document; peak RSS
+// is that of this process (server and load generator, not the mock).
+//
+//   npm run bench -- --targets ocr,gemini --concurrency 1,16,64 --requests 500
+//
+// Images and compositions are made unique per request so the OCR and
+// analysis caches and request coalescing stay out of the picture; pass
+// --repeat true to reuse one payload and measure the cached path instead.
+
+const DEFAULTS = {
+  targets: 'index,ocr,gemini',
+  concurrency: '1,8,32',
+  requests: 200,
+  warmup: 20,
+  latency: 100,
+  jitter: 20,
+  errorRate: 0,
+  streamChunks: 8,
+  repeat: 'false'
+};
+
+// Smallest valid PNG (1x1, transparent). Bytes appended after IEND are
+// ignored by decoders but make every upload hash differently.
+const PNG = Buffer.from(
+  'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==',
+  'base64'
+);
+
+const COMPOSITION = 'Состав: мука пшеничная высшего сорта, сахар, масло растительное (пальмовое), ' +
+  'сироп глюкозно-фруктозный, крахмал кукурузный, соль, разрыхлители (E503, E500), ' +
+  'эмульгатор E322 (лецитин соевый), ароматизатор, молоко сухое обезжиренное, регулятор кислотности E330.';
+
+const TARGETS = {
+  index: (n) => ({
+    path: '/api?languageCodes=ru,en&model=page',
+    headers: { 'Content-Type': 'image/png' },
+    body: n === null ? PNG : Buffer.concat([PNG, Buffer.from(`#${n}`)])
+  }),
+  ocr: (n) => ({
+    path: '/api/ocr?languageCodes=ru,en&model=page',
+    headers: { 'Content-Type': 'image/png' },
+    body: n === null ? PNG : Buffer.concat([PNG, Buffer.from(`#${n}`)])
+  }),
+  gemini: (n) => ({
+    path: '/api/gemini',
+    headers: { 'Content-Type': 'application/json' },
+    body: Buffer.from(JSON.stringify({
+      text: n === null ? COMPOSITION : `${COMPOSITION} Партия ${n}.`,
+      mode: 'analyze'
+    }))
+  })
+};
+
+function startMock(opts) {
+  const child = fork(path.join(__dirname, 'mock-upstream.js'), [
+    '--latency', String(opts.latency),
+    '--jitter', String(opts.jitter),
+    '--error-rate', String(opts.errorRate),
+    '--stream-chunks', String(opts.streamChunks)
+  ]);
+  return new Promise((resolve, reject) => {
+    child.once('error', reject);
+    child.once('message', (msg) => resolve({ child, ...msg }));
+  });
+}
+
+function send(agent, port, { path: urlPath, headers, body }) {
+  return new Promise((resolve) => {
+    const started = process.hrtime.bigint();
+    const req = http.request({
+      host: '127.0.0.1',
+      port,
+      path: urlPath,
+      method: 'POST',
+      agent,
+      headers: { ...headers, 'Content-Length': body.length }
+    }, (res) => {
+      res.resume();
+      res.on('end', () => resolve({
+        status: res.statusCode,
+        ms: Number(process.hrtime.bigint() - started) / 1e6
+      }));
+    });
+    req.on('error', () => resolve({ status: 0, ms: Number(process.hrtime.bigint() - started) / 1e6 }));
+    req.end(body);
+  });
+}
+
+function percentile(sorted, p) {
+  if (!sorted.length) return null;
+  const idx = Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1);
+  return Number(sorted[Math.max(0, idx)].toFixed(2));
+}
+
+async function runLevel(port, target, concurrency, opts, seq) {
+  const make = TARGETS[target];
+  const agent = new http.Agent({ keepAlive: true, maxSockets: concurrency });
+  const next = () => make(opts.repeat === 'true' ? null : seq.n++);
+
+  const drive = async (count, results) => {
+    let issued = 0;
+    const client = async () => {
+      while (issued < count) {
+        issued++;
+        const r = await send(agent, port, next());
+        if (results) results.push(r);
+      }
+    };
+    await Promise.all(Array.from({ length: concurrency }, client));
+  };
+
+  await drive(opts.warmup, null);
+
+  const results = [];
+  const started = process.hrtime.bigint();
+  await drive(opts.requests, results);
+  const seconds = Number(process.hrtime.bigint() - started) / 1e9;
+  agent.destroy();
+
+  const latencies = results.map((r) => r.ms).sort((a, b) => a - b);
+  const statuses = {};
+  for (const r of results) statuses[r.status] = (statuses[r.status] || 0) + 1;
+
+  return {
+    target,
+    concurrency,
+    requests: results.length,
+    errors: results.filter((r) => r.status < 200 || r.status >= 400).length,
+    statuses,
+    rps: Number((results.length / seconds).toFixed(1)),
+    latencyMs: {
+      p50: percentile(latencies, 50),
+      p95: percentile(latencies, 95),
+      p99: percentile(latencies, 99),
+      max: percentile(latencies, 100)
+    }
+  };
+}
+
+async function main() {
+  // Handler logging goes to stderr; stdout carries only the report.
+  console.log = console.error;
+  console.info = console.error;
+
+  const opts = parseArgs(process.argv.slice(2), DEFAULTS);
+  const targets = String(opts.targets).split(',').filter((t) => TARGETS[t]);
+  const levels = String(opts.concurrency).split(',').map(Number).filter((n) => n > 0);
+
+  const mock = await startMock(opts);
+  process.env.YANDEX_OCR_URL = mock.ocrUrl;
+  process.env.GEMINI_MODEL_URL = mock.geminiModelUrl;
+  process.env.YANDEX_API_KEY = process.env.YANDEX_API_KEY || 'bench';
+  process.env.GEMINI_API_KEY = process.env.GEMINI_API_KEY || 'bench';
+  // All load comes from one address; per-client limits would throttle it.
+  process.env.CLIENT_RATE_LIMIT = '0';
+  process.env.CLIENT_MAX_IN_FLIGHT = '1000000';
+
+  // Required only now so the handlers pick up the mock URLs.
+  const { createServer } = require('../api/server');
+  const server = createServer();
+  await new Promise((resolve) => server.listen(0, '127.0.0.1', resolve));
+  const { port } = server.address();
+
+  let peakRss = process.memoryUsage().rss;
+  let levelPeakRss = 0;
+  const sampler = setInterval(() => {
+    const rss = process.memoryUsage().rss;
+    peakRss = Math.max(peakRss, rss);
+    levelPeakRss = Math.max(levelPeakRss, rss);
+  }, 20);
+
+  const seq = { n: 0 };
+  const results = [];
+  for (const target of targets) {
+    for (const concurrency of levels) {
+      levelPeakRss = process.memoryUsage().rss;
+      const result = await runLevel(port, target, concurrency, opts, seq);
+      results.push({ ...result, peakRssBytes: Math.max(levelPeakRss, process.memoryUsage().rss) });
+    }
+  }
+
+  clearInterval(sampler);
+  server.close();
+  mock.child.kill('SIGTERM');
+
+  process.stdout.write(JSON.stringify({
+    node: process.version,
+    mock: {
+      latencyMs: opts.latency,
+      jitterMs: opts.jitter,
+      errorRate: opts.errorRate,
+      streamChunks: opts.streamChunks
+    },
+    cached: opts.repeat === 'true',
+    peakRssBytes: peakRss,
+    results
+  }, null, 2) + '\n');
+}
+
+main().catch((e) => {
+  console.error(e);
+  process.exit(1);
+});
@@ -0,0 +1,160 @@
+'use strict';
+
+const { sha256 } = require('./cache');
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// Per-client admission control in front of the API handlers: each client
+// (a configured API key, else the IP address) gets a token bucket and a cap
+// on concurrent requests. Client state is kept in least recently used
+// order with idle expiry, so memory stays bounded however many addresses
+// show up. Limits apply per process: with WEB_CONCURRENCY workers a client
+// gets up to that many times the configured rate and concurrency.
+
+const throttledTotal = metrics.counter('http_throttled_total', 'Requests rejected by per-client admission control', ['route', 'reason']);
+
+// Behind Vercel (or another proxy that sets it) the client address is the
+// first X-Forwarded-For hop; elsewhere that header is client-controlled.
+const TRUST_PROXY = process.env.TRUST_PROXY
+  ? process.env.TRUST_PROXY === '1'
+  : Boolean(process.env.VERCEL);
+
+// Hashes of the keys in CLIENT_API_KEYS (comma-separated). Only these
+// identify a client; any other key would let a caller pick a fresh bucket
+// per request, so those requests are keyed by IP like anonymous ones.
+const API_KEYS = new Set(String(process.env.CLIENT_API_KEYS || '')
+  .split(',').map((k) => k.trim()).filter(Boolean).map((k) => sha256(k)));
+
+function clientKey(req, apiKeys = API_KEYS) {
+  const apiKey = req.headers['x-api-key'] ||
+    (/^Bearer\s+(.+)$/i.exec(req.headers.authorization || '') || [])[1];
+  if (apiKey) {
+    const hash = sha256(String(apiKey));
+    if (apiKeys.has(hash)) return `key:${hash.slice(0, 32)}`;
+  }
+
+  let ip = req.socket?.remoteAddress || '';
+  if (TRUST_PROXY && req.headers['x-forwarded-for']) {
+    ip = String(req.headers['x-forwarded-for']).split(',')[0].trim();
+  }
+  return `ip:${ip.replace(/^::ffff:/, '')}`;
+}
+
+class AdmissionControl {
+  constructor({
+    ratePerSecond = 1,
+    burst = 10,
+    maxInFlight = 4,
+    maxClients = 10000,
+    idleMs = 10 * 60 * 1000
+  } = {}) {
+    this.ratePerSecond = ratePerSecond;
+    this.burst = burst;
+    this.maxInFlight = maxInFlight;
+    this.maxClients = maxClients;
+    this.idleMs = idleMs;
+    // Map iteration order is insertion order; re-inserting on access keeps
+    // the least recently used client first.
+    this.clients = new Map();
+    this.counters = { admitted: 0, rateLimited: 0, concurrencyLimited: 0 };
+  }
+
+  _client(key) {
+    const now = Date.now();
+    let client = this.clients.get(key);
+    if (!client) {
+      client = { tokens: this.burst, refilledAt: now, usedAt: now, inFlight: 0 };
+    } else {
+      if (this.ratePerSecond) {
+        client.tokens = Math.min(this.burst, client.tokens + ((now - client.refilledAt) / 1000) * this.ratePerSecond);
+        client.refilledAt = now;
+      }
+      client.usedAt = now;
+      this.clients.delete(key);
+    }
+    this.clients.set(key, client);
+    this._prune(key, now);
+    return client;
+  }
+
+  // Drops idle clients from the least recently used end, and more while
+  // over maxClients. A client idle for idleMs has a full bucket again, so
+  // dropping it loses nothing; a client with requests in flight is never
+  // dropped, or its concurrency count would start over at 0. Neither is
+  // the client being admitted.
+  _prune(current, now) {
+    for (const [key, client] of this.clients) {
+      if (key === current) break;
+      const over = this.clients.size > this.maxClients;
+      const idle = now - client.usedAt >= this.idleMs;
+      if (!over && !idle) break;
+      if (client.inFlight === 0) this.clients.delete(key);
+    }
+  }
+
+  // Returns { release } when admitted, or { reason, retryAfter } (seconds).
+  admit(key) {
+    const client = this._client(key);
+    if (client.inFlight >= this.maxInFlight) {
+      this.counters.concurrencyLimited++;
+      return { reason: 'concurrency', retryAfter: 1 };
+    }
+    if (this.ratePerSecond && client.tokens < 1) {
+      this.counters.rateLimited++;
+      return { reason: 'rate', retryAfter: Math.max(1, Math.ceil((1 - client.tokens) / this.ratePerSecond)) };
+    }
+    if (this.ratePerSecond) client.tokens -= 1;
+    client.inFlight++;
+    this.counters.admitted++;
+    let released = false;
+    return {
+      release: () => {
+        if (released) return;
+        released = true;
+        client.inFlight--;
+      }
+    };
+  }
+
+  stats() {
+    return { ...this.counters, clients: this.clients.size };
+  }
+}
+
+// A blank or invalid value (CLIENT_RATE_LIMIT= copied from .env.example)
+// keeps the default; only an explicit 0 turns rate limiting off.
+function envNumber(name, fallback, min = 1) {
+  const value = (process.env[name] || '').trim();
+  const n = value === '' ? NaN : Number(value);
+  return Number.isFinite(n) && n >= min ? n : fallback;
+}
+
+const admission = new AdmissionControl({
+  ratePerSecond: envNumber('CLIENT_RATE_LIMIT', 1, 0),
+  burst: envNumber('CLIENT_RATE_BURST', 10),
+  maxInFlight: envNumber('CLIENT_MAX_IN_FLIGHT', 4),
+  maxClients: envNumber('CLIENT_TRACKED_MAX', 10000)
+});
+
+stats.register('admission', () => admission.stats());
+
+// Admits req or answers 429 with Retry-After. Returns the release function
+// to call when the request finishes, or null if it was rejected.
+function admitRequest(route, req, res) {
+  if (req.method === 'OPTIONS') return () => {};
+  const result = admission.admit(clientKey(req));
+  if (result.release) return result.release;
+
+  throttledTotal.inc({ route, reason: result.reason });
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Retry-After', String(result.retryAfter));
+  res.statusCode = 429;
+  res.setHeader('Content-Type', 'application/json; charset=utf-8');
+  res.end(JSON.stringify({
+    error: result.reason === 'rate' ? 'Too many requests' : 'Too many concurrent requests',
+    retryAfter: result.retryAfter
+  }));
+  return null;
+}
+
+module.exports = { AdmissionControl, clientKey, admitRequest };
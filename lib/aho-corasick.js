@@ -0,0 +1,83 @@
+'use strict';
+
+// Aho-Corasick automaton: finds every occurrence of any number of patterns
+// in one left-to-right pass over the text, in time linear in the text plus
+// the number of matches. Add all patterns, call build() once, then search.
+
+class AhoCorasick {
+  constructor() {
+    this.next = [new Map()];
+    this.fail = [0];
+    this.out = [[]];
+    this.built = false;
+  }
+
+  add(pattern, value) {
+    if (this.built) throw new Error('Automaton is already built');
+    let state = 0;
+    for (const ch of pattern.split('')) {
+      let to = this.next[state].get(ch);
+      if (to === undefined) {
+        to = this.next.length;
+        this.next.push(new Map());
+        this.fail.push(0);
+        this.out.push([]);
+        this.next[state].set(ch, to);
+      }
+      state = to;
+    }
+    this.out[state].push({ length: pattern.length, value });
+    return this;
+  }
+
+  // Breadth-first over the trie: each state's failure link is the longest
+  // proper suffix that is also a trie path, and it inherits that state's
+  // outputs so search() never has to walk the failure chain for matches.
+  build() {
+    const queue = [];
+    for (const to of this.next[0].values()) queue.push(to);
+    for (let i = 0; i < queue.length; i++) {
+      const state = queue[i];
+      for (const [ch, to] of this.next[state]) {
+        let f = this.fail[state];
+        while (f && !this.next[f].has(ch)) f = this.fail[f];
+        const target = this.next[f].get(ch);
+        this.fail[to] = target !== undefined && target !== to ? target : 0;
+        if (this.out[this.fail[to]].length) {
+          this.out[to] = this.out[to].concat(this.out[this.fail[to]]);
+        }
+        queue.push(to);
+      }
+    }
+    this.built = true;
+    return this;
+  }
+
+  get states() {
+    return this.next.length;
+  }
+
+  // Calls onMatch(end, length, value) for each pattern occurrence in
+  // `text`; `end` is the exclusive end index. Indices are UTF-16 code units,
+  // like String#slice.
+  scan(text, onMatch) {
+    if (!this.built) this.build();
+    let state = 0;
+    for (let i = 0; i < text.length; i++) {
+      const ch = text[i];
+      while (state && !this.next[state].has(ch)) state = this.fail[state];
+      state = this.next[state].get(ch) || 0;
+      for (const { length, value } of this.out[state]) onMatch(i + 1, length, value);
+    }
+  }
+
+  search(text) {
+    const matches = [];
+    this.scan(text, (end, length, value) => {
+      matches.push({ start: end - length, end, value });
+    });
+    return matches;
+  }
+}
+
+module.exports = { AhoCorasick };
@@ -0,0 +1,170 @@
+'use strict';
+
+const additives = require('./data/additives.json');
+const allergens = require('./data/allergens.json');
+const { findMatches } = require('./dictionary');
+const { analyzeComposition, streamComposition, cachedComposition } = require('./gemini');
+const timing = require('./timing');
+
+// Rule-based composition analysis from the bundled E-number and allergen
+// tables. Produces the same JSON shape as the Gemini `analyze` prompt in a
+// few milliseconds; `runAnalysis` picks between it, Gemini, or both.
+
+const ENGINES = ['gemini', 'local', 'hybrid'];
+
+const RISK_ORDER = ['safe', 'moderate', 'high'];
+
+const VERDICTS = {
+  safe: 'Спорных пищевых добавок не найдено',
+  moderate: 'Есть добавки, которые стоит ограничить',
+  high: 'Содержит добавки с высоким риском'
+};
+
+const ADVICE = {
+  safe: 'Состав выглядит спокойно; проверьте аллергены и количество сахара и соли.',
+  moderate: 'Употребляйте умеренно и сравните с аналогами без отмеченных добавок.',
+  high: 'Лучше выбрать аналог без отмеченных добавок, особенно для детей.'
+};
+
+// Distinct additives (code -> table entry, or null for codes missing from
+// the table) and allergen ids, in order of first appearance.
+function summarize(matches) {
+  const foundAdditives = new Map();
+  const foundAllergens = new Set();
+  for (const m of matches) {
+    if (m.category === 'additive') {
+      if (!foundAdditives.has(m.id)) foundAdditives.set(m.id, additives[m.id] || null);
+    } else {
+      foundAllergens.add(m.id);
+    }
+  }
+  return { foundAdditives, foundAllergens };
+}
+
+function maxRisk(a, b) {
+  return RISK_ORDER.indexOf(a) >= RISK_ORDER.indexOf(b) ? a : b;
+}
+
+function describeAdditive(code, info) {
+  return info ? `${code} — ${info.name} (${info.category})` : `${code} — пищевая добавка`;
+}
+
+// `matches` may be passed in when the caller already has findMatches(text).
+function analyzeLocally(text, matches = findMatches(text)) {
+  const { foundAdditives, foundAllergens } = summarize(matches);
+
+  let riskLevel = 'safe';
+  for (const info of foundAdditives.values()) {
+    if (info) riskLevel = maxRisk(riskLevel, info.risk);
+  }
+
+  const features = [];
+  if (foundAdditives.size) {
+    features.push(`Пищевых добавок: ${foundAdditives.size}`);
+    const risky = [...foundAdditives].filter(([, info]) => info && info.risk === 'high');
+    if (risky.length) features.push(`Высокий риск: ${risky.map(([code]) => code).join(', ')}`);
+  } else {
+    features.push('Без E-добавок');
+  }
+
+  return {
+    productName: '',
+    verdict: VERDICTS[riskLevel],
+    riskLevel,
+    highlights: [...foundAdditives].map(([code, info]) => describeAdditive(code, info)),
+    allergens: [...foundAllergens].map((id) => allergens[id].name),
+    features,
+    advice: ADVICE[riskLevel]
+  };
+}
+
+function summarizeStrings(strings) {
+  return summarize(findMatches(strings.join(' \n ')));
+}
+
+// Gemini's answer wins for free-form fields; highlights and allergens are
+// unioned (deduplicated by E-code / allergen group) and the risk level is
+// the higher of the two.
+function mergeAnalyses(gemini, local) {
+  const merged = { ...local, ...gemini };
+
+  if (gemini.riskLevel !== undefined) {
+    merged.riskLevel = RISK_ORDER.includes(gemini.riskLevel)
+      ? maxRisk(gemini.riskLevel, local.riskLevel)
+      : local.riskLevel;
+  }
+
+  if (Array.isArray(gemini.highlights)) {
+    const mentioned = summarizeStrings(gemini.highlights).foundAdditives;
+    merged.highlights = [
+      ...gemini.highlights,
+      ...local.highlights.filter((h) => !mentioned.has(h.split(' ')[0]))
+    ];
+  }
+
+  if (Array.isArray(gemini.allergens)) {
+    const mentioned = new Set([...summarizeStrings(gemini.allergens).foundAllergens]
+      .map((id) => allergens[id].name));
+    merged.allergens = [
+      ...gemini.allergens,
+      ...local.allergens.filter((name) => !mentioned.has(name))
+    ];
+  }
+
+  return merged;
+}
+
+// engine: 'gemini' (default), 'local' (tables only) or 'hybrid' (Gemini
+// merged with the local result). Recipes always go to Gemini. With
+// onField the result is streamed field by field; in hybrid mode the local
+// fields go out first and a Gemini failure degrades to the local result.
+// `matches` from findMatches(text) is reused when given.
+async function runAnalysis(apiKey, { mode = 'analyze', text, engine = 'gemini', matches }, onField = null) {
+  if (mode === 'recipes' || engine === 'gemini') {
+    return onField
+      ? streamComposition(apiKey, mode, text, onField)
+      : analyzeComposition(apiKey, mode, text);
+  }
+
+  const endLocal = timing.span('local');
+  const local = analyzeLocally(text, matches);
+  endLocal();
+  if (engine === 'local') {
+    if (onField) {
+      for (const [key, value] of Object.entries(local)) onField(key, value);
+    }
+    return { result: local, cached: false };
+  }
+
+  if (onField) {
+    onField('riskLevel', local.riskLevel);
+    onField('highlights', local.highlights);
+    onField('allergens', local.allergens);
+  }
+  try {
+    const { result, cached } = onField
+      ? await streamComposition(apiKey, mode, text, (key, value) => {
+        onField(key, mergeAnalyses({ [key]: value }, local)[key]);
+      })
+      : await analyzeComposition(apiKey, mode, text);
+    return { result: mergeAnalyses(result, local), cached };
+  } catch (e) {
+    console.error('[Analyzer] Gemini failed, using local analysis:', e.message);
+    if (onField) {
+      for (const [key, value] of Object.entries(local)) onField(key, value);
+    }
+    return { result: local, cached: false };
+  }
+}
+
+// What runAnalysis would answer for text without calling Gemini: the local
+// result, merged with Gemini's for hybrid, or null when a Gemini answer is
+// needed and not cached.
+function cachedAnalysis({ text, engine = 'gemini', matches }) {
+  if (engine === 'local') return analyzeLocally(text, matches);
+  const gemini = cachedComposition('analyze', text);
+  if (gemini === undefined) return null;
+  return engine === 'hybrid' ? mergeAnalyses(gemini, analyzeLocally(text, matches)) : gemini;
+}
+
+module.exports = { ENGINES, analyzeLocally, mergeAnalyses, runAnalysis, cachedAnalysis };
@@ -0,0 +1,265 @@
+'use strict';
+
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+function sha256(data) {
+  return crypto.createHash('sha256').update(data).digest('hex');
+}
+
+// In-memory LRU keyed by string. Map iteration order is insertion order, so
+// re-inserting on access keeps the least recently used entry first.
+class LruCache {
+  constructor({ maxEntries = 500, maxBytes = Infinity, ttlMs = 0, sizeOf = defaultSizeOf } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.ttlMs = ttlMs;
+    this.sizeOf = sizeOf;
+    this.map = new Map();
+    this.bytes = 0;
+    this.counters = { hits: 0, misses: 0, evictions: 0, expirations: 0 };
+  }
+
+  get(key) {
+    const entry = this.map.get(key);
+    if (!entry) {
+      this.counters.misses++;
+      return undefined;
+    }
+    if (entry.expiresAt && entry.expiresAt <= Date.now()) {
+      this._remove(key, entry);
+      this.counters.expirations++;
+      this.counters.misses++;
+      return undefined;
+    }
+    this.map.delete(key);
+    this.map.set(key, entry);
+    this.counters.hits++;
+    return entry.value;
+  }
+
+  set(key, value, ttlMs = this.ttlMs) {
+    const existing = this.map.get(key);
+    if (existing) this._remove(key, existing);
+
+    const size = this.sizeOf(value);
+    if (size > this.maxBytes) return;
+
+    const expiresAt = ttlMs > 0 ? Date.now() + ttlMs : 0;
+    this.map.set(key, { value, size, expiresAt });
+    this.bytes += size;
+
+    while (this.map.size > this.maxEntries || this.bytes > this.maxBytes) {
+      const [oldestKey, oldest] = this.map.entries().next().value;
+      this._remove(oldestKey, oldest);
+      this.counters.evictions++;
+    }
+  }
+
+  delete(key) {
+    const entry = this.map.get(key);
+    if (entry) this._remove(key, entry);
+  }
+
+  _remove(key, entry) {
+    this.map.delete(key);
+    this.bytes -= entry.size;
+  }
+
+  stats() {
+    return { ...this.counters, entries: this.map.size, bytes: this.bytes };
+  }
+}
+
+function defaultSizeOf(value) {
+  if (typeof value === 'string') return Buffer.byteLength(value);
+  return Buffer.byteLength(JSON.stringify(value) || '');
+}
+
+// One JSON file per key under `dir`, named by a hash of the key. Entries
+// carry their own expiry and are removed when read after it. A periodic
+// sweep also removes files older than the TTL, and then the oldest files
+// until the tier is back under maxEntries and maxBytes, so entries that
+// are never read again do not pile up.
+class DiskCache {
+  constructor({
+    dir,
+    ttlMs = 0,
+    maxEntries = Infinity,
+    maxBytes = Infinity,
+    sweepIntervalMs = 10 * 60 * 1000
+  }) {
+    this.dir = dir;
+    this.ttlMs = ttlMs;
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.counters = { hits: 0, misses: 0, expirations: 0, evictions: 0, writes: 0, errors: 0 };
+    this.usage = { files: 0, bytes: 0 };
+    this.sweeping = null;
+    this.ready = fs.promises.mkdir(dir, { recursive: true }).catch(() => {});
+    if (sweepIntervalMs > 0) {
+      this.ready.then(() => this.sweep());
+      this.timer = setInterval(() => this.sweep(), sweepIntervalMs);
+      this.timer.unref();
+    }
+  }
+
+  _file(key) {
+    return path.join(this.dir, `${sha256(key)}.json`);
+  }
+
+  async get(key) {
+    await this.ready;
+    const file = this._file(key);
+    let entry;
+    try {
+      entry = JSON.parse(await fs.promises.readFile(file, 'utf8'));
+    } catch (e) {
+      if (e.code !== 'ENOENT') this.counters.errors++;
+      this.counters.misses++;
+      return undefined;
+    }
+    if (entry.expiresAt && entry.expiresAt <= Date.now()) {
+      fs.promises.unlink(file).catch(() => {});
+      this.counters.expirations++;
+      this.counters.misses++;
+      return undefined;
+    }
+    this.counters.hits++;
+    return entry.value;
+  }
+
+  async set(key, value, ttlMs = this.ttlMs) {
+    await this.ready;
+    const file = this._file(key);
+    const tmp = `${file}.${process.pid}.${Date.now()}.tmp`;
+    const expiresAt = ttlMs > 0 ? Date.now() + ttlMs : 0;
+    try {
+      await fs.promises.writeFile(tmp, JSON.stringify({ expiresAt, value }));
+      await fs.promises.rename(tmp, file);
+      this.counters.writes++;
+    } catch (e) {
+      this.counters.errors++;
+      fs.promises.unlink(tmp).catch(() => {});
+    }
+  }
+
+  // Resolves once the files have been checked; concurrent calls share one
+  // pass. Age is the file's mtime, i.e. when the entry was written.
+  sweep() {
+    if (!this.sweeping) {
+      this.sweeping = this._sweep().finally(() => {
+        this.sweeping = null;
+      });
+    }
+    return this.sweeping;
+  }
+
+  async _sweep() {
+    await this.ready;
+    let names;
+    try {
+      names = await fs.promises.readdir(this.dir);
+    } catch (e) {
+      this.counters.errors++;
+      return;
+    }
+    const now = Date.now();
+    const files = [];
+    for (const name of names) {
+      // Leftovers of writes that never got renamed count as expired.
+      const tmp = name.endsWith('.tmp');
+      if (!tmp && !name.endsWith('.json')) continue;
+      const file = path.join(this.dir, name);
+      let stat;
+      try {
+        stat = await fs.promises.stat(file);
+      } catch (e) {
+        continue;
+      }
+      const age = now - stat.mtimeMs;
+      if (tmp ? age > 60 * 1000 : this.ttlMs > 0 && age >= this.ttlMs) {
+        if (await this._unlink(file) && !tmp) this.counters.expirations++;
+      } else if (!tmp) {
+        files.push({ file, size: stat.size, mtimeMs: stat.mtimeMs });
+      }
+    }
+
+    let bytes = files.reduce((sum, f) => sum + f.size, 0);
+    let count = files.length;
+    if (count > this.maxEntries || bytes > this.maxBytes) {
+      files.sort((a, b) => a.mtimeMs - b.mtimeMs);
+      for (const f of files) {
+        if (count <= this.maxEntries && bytes <= this.maxBytes) break;
+        if (await this._unlink(f.file)) this.counters.evictions++;
+        count--;
+        bytes -= f.size;
+      }
+    }
+    this.usage = { files: count, bytes };
+  }
+
+  async _unlink(file) {
+    try {
+      await fs.promises.unlink(file);
+      return true;
+    } catch (e) {
+      // Already removed by a read or by another worker's sweep.
+      if (e.code !== 'ENOENT') this.counters.errors++;
+      return false;
+    }
+  }
+
+  stats() {
+    return { ...this.counters, ...this.usage, dir: this.dir };
+  }
+}
+
+// Memory LRU in front of an optional disk tier. Disk hits are promoted
+// into memory so the next lookup stays in-process.
+class TieredCache {
+  constructor({ memory, disk = null }) {
+    this.memory = memory;
+    this.disk = disk;
+  }
+
+  async get(key) {
+    const value = this.memory.get(key);
+    if (value !== undefined || !this.disk) return value;
+    const stored = await this.disk.get(key);
+    if (stored !== undefined) this.memory.set(key, stored);
+    return stored;
+  }
+
+  async set(key, value) {
+    this.memory.set(key, value);
+    if (this.disk) await this.disk.set(key, value);
+  }
+
+  stats() {
+    return {
+      memory: this.memory.stats(),
+      disk: this.disk ? this.disk.stats() : null
+    };
+  }
+}
+
+// Metric families (see lib/metrics.js collect()) for a cache's tiers, given
+// as { tierName: stats() result or null }.
+function cacheMetricFamilies(cache, tiers, labels) {
+  const lookups = {};
+  const entries = {};
+  for (const [tier, s] of Object.entries(tiers)) {
+    if (!s) continue;
+    lookups[labels({ cache, tier, result: 'hit' })] = s.hits || 0;
+    lookups[labels({ cache, tier, result: 'miss' })] = s.misses || 0;
+    if (s.entries !== undefined) entries[labels({ cache, tier })] = s.entries;
+  }
+  return {
+    cache_lookups_total: { type: 'counter', help: 'Cache lookups by cache, tier and result', series: lookups },
+    cache_entries: { type: 'gauge', help: 'Entries held in memory cache tiers', series: entries }
+  };
+}
+
+module.exports = { sha256, LruCache, DiskCache, TieredCache, cacheMetricFamilies };
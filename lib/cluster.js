@@ -0,0 +1,126 @@
+'use strict';
+
+const cluster = require('cluster');
+const os = require('os');
+const { mergeSnapshots } = require('./stats');
+
+// Primary side of the standalone server's cluster mode: forks workers,
+// replaces crashed ones with backoff, rolls them on SIGHUP, drains them on
+// SIGTERM and answers aggregated stats requests from workers.
+
+const DRAIN_TIMEOUT_MS = Number(process.env.DRAIN_TIMEOUT_MS) || 30000;
+const STATS_TIMEOUT_MS = 1000;
+const MIN_RESTART_DELAY_MS = 500;
+const MAX_RESTART_DELAY_MS = 30000;
+const STABLE_AFTER_MS = 10000;
+
+function workerCount(value = process.env.WEB_CONCURRENCY) {
+  if (!value) return 1;
+  if (value === 'auto') {
+    return typeof os.availableParallelism === 'function'
+      ? os.availableParallelism()
+      : os.cpus().length;
+  }
+  return Math.max(1, Number.parseInt(value, 10) || 1);
+}
+
+function runCluster({ workers = workerCount(), drainTimeoutMs = DRAIN_TIMEOUT_MS } = {}) {
+  const stopping = new Set();
+  const startedAt = new Map();
+  let restartDelay = MIN_RESTART_DELAY_MS;
+  let shuttingDown = false;
+  let statsSeq = 0;
+
+  function fork() {
+    const worker = cluster.fork();
+    startedAt.set(worker.id, Date.now());
+    worker.on('message', (msg) => onMessage(worker, msg));
+    return worker;
+  }
+
+  function drain(worker) {
+    if (stopping.has(worker.id) || worker.isDead()) return;
+    stopping.add(worker.id);
+    worker.send({ type: 'shutdown' });
+    const timer = setTimeout(() => worker.process.kill('SIGKILL'), drainTimeoutMs + 1000);
+    timer.unref();
+    worker.once('exit', () => clearTimeout(timer));
+  }
+
+  function onMessage(worker, msg) {
+    if (!msg || msg.type !== 'stats:request') return;
+    collectStats().then((stats) => {
+      if (!worker.isDead()) worker.send({ type: 'stats:response', id: msg.id, stats });
+    });
+  }
+
+  function collectStats() {
+    const id = ++statsSeq;
+    const live = Object.values(cluster.workers).filter((w) => w && !w.isDead());
+    return new Promise((resolve) => {
+      const reports = [];
+      const onReport = (worker, msg) => {
+        if (!msg || msg.type !== 'stats:report' || msg.id !== id) return;
+        reports.push(msg.stats);
+        if (reports.length === live.length) finish();
+      };
+      const finish = () => {
+        clearTimeout(timer);
+        cluster.off('message', onReport);
+        resolve({ ...mergeSnapshots(reports), workers: { live: live.length, reported: reports.length } });
+      };
+      const timer = setTimeout(finish, STATS_TIMEOUT_MS);
+      cluster.on('message', onReport);
+      for (const worker of live) worker.send({ type: 'stats:collect', id });
+    });
+  }
+
+  async function rollingRestart() {
+    const old = Object.values(cluster.workers).filter((w) => w && !stopping.has(w.id));
+    console.log(`[Cluster] Rolling restart of ${old.length} workers`);
+    for (const worker of old) {
+      const replacement = fork();
+      await new Promise((resolve) => {
+        replacement.once('listening', resolve);
+        replacement.once('exit', resolve);
+      });
+      drain(worker);
+    }
+  }
+
+  function shutdown() {
+    if (shuttingDown) return;
+    shuttingDown = true;
+    console.log('[Cluster] Draining workers');
+    for (const worker of Object.values(cluster.workers)) {
+      if (worker) drain(worker);
+    }
+  }
+
+  cluster.on('exit', (worker, code, signal) => {
+    const intentional = stopping.delete(worker.id);
+    const uptime = Date.now() - (startedAt.get(worker.id) || 0);
+    startedAt.delete(worker.id);
+
+    if (shuttingDown) {
+      if (!Object.keys(cluster.workers).length) process.exit(0);
+      return;
+    }
+    if (intentional) return;
+
+    console.error(`[Cluster] Worker ${worker.process.pid} died (${signal || code}), restarting in ${restartDelay}ms`);
+    setTimeout(fork, restartDelay);
+    restartDelay = uptime > STABLE_AFTER_MS
+      ? MIN_RESTART_DELAY_MS
+      : Math.min(restartDelay * 2, MAX_RESTART_DELAY_MS);
+  });
+
+  process.on('SIGHUP', rollingRestart);
+  process.once('SIGTERM', shutdown);
+  process.once('SIGINT', shutdown);
+
+  console.log(`[Cluster] Primary ${process.pid} starting ${workers} workers`);
+  for (let i = 0; i < workers; i++) fork();
+}
+
+module.exports = { workerCount, runCluster };
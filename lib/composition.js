@@ -0,0 +1,150 @@
+'use strict';
+
+const { foldLookalikes } = require('./text');
+const stats = require('./stats');
+const timing = require('./timing');
+
+// Cuts whole-package OCR text down to what the analysis needs: the
+// composition, allergen warnings and nutrition facts, plus a short first
+// block for the product name. Paragraphs of the text are the OCR blocks in
+// reading order (lib/layout.js), so a block that continues the composition
+// is the paragraph right after it. Anchors are matched on lowercased,
+// lookalike-folded text, so "Cостав" with a Latin C still counts. Text
+// without a composition anchor is returned unchanged.
+
+const ENABLED = process.env.COMPOSITION_FILTER !== '0';
+
+const ANCHORS = {
+  composition: ['состав', 'ingredients', 'склад', 'zutaten'],
+  nutrition: ['пищевая ценность', 'пищевая и энергетическая ценность', 'энергетическая ценность', 'nutrition', 'nutritional value', 'energy value'],
+  allergens: ['может содержать', 'содержит следы', 'may contain', 'contains traces'],
+  // Sections that end the composition: storage, dates, manufacturer, etc.
+  stop: [
+    'хранить', 'условия хранения', 'срок годности', 'годен до', 'дата изготовления',
+    'изготовитель', 'производитель', 'импортер', 'адрес', 'масса нетто', 'вес нетто',
+    'store', 'storage', 'best before', 'manufactured', 'produced by', 'net weight'
+  ]
+};
+
+// Longest block kept as the product name heading.
+const MAX_HEADING_CHARS = 120;
+// Blocks after the composition anchor that may still continue it.
+const MAX_CONTINUATIONS = 3;
+
+const NUTRITION_ROW_RE = /\d\s*(г|мг|ккал|кдж|g|mg|kcal|kj)(?!\p{L})/iu;
+
+function anchorRe(words) {
+  const alternatives = words.map((w) => foldLookalikes(w).replace(/[.*+?^${}()|[\]\\]/g, '\\$&'));
+  // Whole words only: "состав" but not "составе".
+  return new RegExp(`(?<![\\p{L}\\p{N}])(?:${alternatives.join('|')})(?![\\p{L}\\p{N}])`, 'gu');
+}
+
+const RES = Object.fromEntries(Object.entries(ANCHORS).map(([kind, words]) => [kind, anchorRe(words)]));
+
+const counters = { calls: 0, selected: 0, fallback: 0, charsIn: 0, charsOut: 0 };
+
+stats.register('composition', () => ({ ...counters }));
+
+// Offset of the first anchor of `kind` at or after `from` in a folded
+// block, or -1. Folding maps each character to one character, so offsets
+// carry over to the original block.
+function find(kind, folded, from = 0) {
+  const re = RES[kind];
+  re.lastIndex = from;
+  const match = re.exec(folded);
+  return match ? match.index : -1;
+}
+
+// Block i from `start`, cut before any stop anchor after it.
+function section(blocks, folded, i, start) {
+  const stop = find('stop', folded[i], start + 1);
+  return blocks[i].slice(start, stop === -1 ? blocks[i].length : stop).trim();
+}
+
+// A block continues the composition unless it starts a section of its own;
+// lists broken across blocks show as a block that does not end a sentence
+// or one that starts in lowercase.
+function continues(previous, block, folded) {
+  if (find('stop', folded) === 0 || find('nutrition', folded) !== -1) return false;
+  if (find('allergens', folded) !== -1) return true;
+  return !/[.!]\s*$/.test(previous) || /^[\p{Ll}\d(,;]/u.test(block);
+}
+
+// Returns { text, selected }: the selected blocks joined by blank lines, or
+// the input and selected: false when no composition anchor is found.
+function selectComposition(text) {
+  const blocks = String(text || '').split(/\n{2,}/);
+  const folded = blocks.map((block) => foldLookalikes(block.toLowerCase()));
+  let anchorBlock = -1;
+  let anchorAt = -1;
+  for (let i = 0; i < blocks.length && anchorBlock === -1; i++) {
+    const at = find('composition', folded[i]);
+    if (at !== -1) {
+      anchorBlock = i;
+      anchorAt = at;
+    }
+  }
+  if (anchorBlock === -1) return { text, selected: false };
+
+  const picked = new Map();
+  const heading = blocks[0].trim();
+  if (anchorBlock > 0 && heading.length <= MAX_HEADING_CHARS && find('stop', folded[0]) === -1) {
+    picked.set(0, heading);
+  } else if (anchorAt > 0 && anchorAt <= MAX_HEADING_CHARS) {
+    // Name and composition in one block: keep the name in front.
+    picked.set(-1, blocks[anchorBlock].slice(0, anchorAt).trim());
+  }
+
+  let previous = section(blocks, folded, anchorBlock, anchorAt);
+  picked.set(anchorBlock, previous);
+  for (let i = anchorBlock + 1; i < blocks.length && i <= anchorBlock + MAX_CONTINUATIONS; i++) {
+    if (!continues(previous, blocks[i], folded[i])) break;
+    previous = section(blocks, folded, i, 0);
+    picked.set(i, previous);
+    if (find('stop', folded[i], 1) !== -1) break;
+  }
+
+  // Nutrition facts (with a following table-like block) and allergen
+  // warnings wherever they are.
+  for (let i = 0; i < blocks.length; i++) {
+    if (picked.has(i)) continue;
+    const nutrition = find('nutrition', folded[i]);
+    if (nutrition !== -1) {
+      picked.set(i, section(blocks, folded, i, nutrition));
+      if (i + 1 < blocks.length && !picked.has(i + 1) && NUTRITION_ROW_RE.test(blocks[i + 1]) &&
+        find('composition', folded[i + 1]) === -1) {
+        picked.set(i + 1, section(blocks, folded, i + 1, 0));
+        i++;
+      }
+      continue;
+    }
+    const allergens = find('allergens', folded[i]);
+    if (allergens !== -1) picked.set(i, section(blocks, folded, i, allergens));
+  }
+
+  let out = '';
+  for (const i of [...picked.keys()].sort((a, b) => a - b)) {
+    const part = picked.get(i);
+    if (part) out += out ? `\n\n${part}` : part;
+  }
+  return { text: out, selected: true };
+}
+
+// The text to send for analysis: the selected composition, or the whole
+// text when there is no anchor or the filter is off (COMPOSITION_FILTER=0).
+function analysisText(input) {
+  // body.text is client input and need not be a string.
+  const text = String(input ?? '');
+  if (!ENABLED) return text;
+  const end = timing.span('composition');
+  const { text: selected, selected: found } = selectComposition(text);
+  end();
+  counters.calls++;
+  counters.charsIn += text.length;
+  counters.charsOut += selected.length;
+  if (found) counters.selected++;
+  else counters.fallback++;
+  return selected;
+}
+
+module.exports = { ANCHORS, selectComposition, analysisText };
@@ -0,0 +1,102 @@
+'use strict';
+
+const zlib = require('zlib');
+
+// Response compression. API bodies above COMPRESS_MIN_BYTES are brotli- or
+// gzip-encoded on the fly, whichever the client prefers; static assets are
+// compressed once at build time (scripts/precompress.js) and the server
+// only picks the matching file.
+
+const MIN_BYTES = Number(process.env.COMPRESS_MIN_BYTES) || 1024;
+
+// Preferred first when the client rates them equally.
+const ENCODINGS = ['br', 'gzip'];
+
+// Fast settings for per-request work; the build step uses the maximum.
+const BROTLI_OPTIONS = { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: 5 } };
+const GZIP_OPTIONS = { level: 6 };
+
+const COMPRESSIBLE_RE = /^(text\/|application\/(json|javascript|manifest\+json|xml)|image\/svg\+xml)/;
+
+// Picks br or gzip from an Accept-Encoding header, honouring q-values
+// (q=0 rules an encoding out). Null when neither is acceptable.
+function negotiate(header) {
+  if (!header) return null;
+  const q = {};
+  for (const part of String(header).split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';');
+    if (!name) continue;
+    const qParam = params.map((p) => p.trim()).find((p) => p.startsWith('q='));
+    q[name] = qParam ? Number(qParam.slice(2)) || 0 : 1;
+  }
+  let best = null;
+  let bestQ = 0;
+  for (const encoding of ENCODINGS) {
+    const value = encoding in q ? q[encoding] : (q['*'] || 0);
+    if (value > bestQ) {
+      best = encoding;
+      bestQ = value;
+    }
+  }
+  return best;
+}
+
+function isCompressible(contentType) {
+  return COMPRESSIBLE_RE.test(String(contentType || ''));
+}
+
+function compress(body, encoding) {
+  return encoding === 'br'
+    ? zlib.brotliCompressSync(body, BROTLI_OPTIONS)
+    : zlib.gzipSync(body, GZIP_OPTIONS);
+}
+
+function addVary(res, value) {
+  const vary = res.getHeader('Vary');
+  if (!vary) {
+    res.setHeader('Vary', value);
+  } else if (!String(vary).toLowerCase().split(/\s*,\s*/).includes(value.toLowerCase())) {
+    res.setHeader('Vary', `${vary}, ${value}`);
+  }
+}
+
+const PATCHED = Symbol('compressResponses');
+
+// Makes res.json()/res.send() compress string and Buffer bodies of at least
+// minBytes when the request accepts it. Streams written with res.write()
+// (SSE) are left alone.
+function compressResponses(req, res, { minBytes = MIN_BYTES } = {}) {
+  // Applied once per response (lib/middleware.js); a second call would
+  // compress the already encoded body again.
+  if (res[PATCHED]) return res;
+  res[PATCHED] = true;
+  const encoding = negotiate(req.headers['accept-encoding']);
+  const send = res.send;
+
+  res.send = (body) => {
+    if (typeof body !== 'string' && !Buffer.isBuffer(body)) return send.call(res, body);
+    if (!res.getHeader('Content-Type')) res.setHeader('Content-Type', 'text/html; charset=utf-8');
+    if (!isCompressible(res.getHeader('Content-Type'))) return send.call(res, body);
+
+    addVary(res, 'Accept-Encoding');
+    const raw = Buffer.isBuffer(body) ? body : Buffer.from(body);
+    if (!encoding || raw.length < minBytes || res.getHeader('Content-Encoding') || req.method === 'HEAD') {
+      return send.call(res, raw);
+    }
+    const encoded = compress(raw, encoding);
+    res.setHeader('Content-Encoding', encoding);
+    res.setHeader('Content-Length', encoded.length);
+    res.end(encoded);
+    return res;
+  };
+
+  res.json = (obj) => {
+    if (!res.getHeader('Content-Type')) {
+      res.setHeader('Content-Type', 'application/json; charset=utf-8');
+    }
+    return res.send(JSON.stringify(obj));
+  };
+  return res;
+}
+
+module.exports = { ENCODINGS, negotiate, isCompressible, compressResponses, addVary };
@@ -0,0 +1,143 @@
+'use strict';
+
+const additives = require('./data/additives.json');
+const allergens = require('./data/allergens.json');
+const { AhoCorasick } = require('./aho-corasick');
+const { LOOKALIKES } = require('./text');
+
+// The E-number and allergen tables compiled into one Aho-Corasick
+// automaton at cold start. findMatches() scans raw OCR text once and
+// reports offsets into that same text, so results can be used for
+// highlighting as well as for the local analysis.
+
+const WORD_RE = /[\p{L}\p{N}]/u;
+const SPACE_RE = /\s/;
+const SPACE = 0x20;
+const utf16 = new TextDecoder('utf-16le');
+
+function isWordChar(ch) {
+  return ch !== undefined && WORD_RE.test(ch);
+}
+
+// Character-for-character normalization (case, look-alike letters, dashes,
+// blanks), so an index into the normalized text is an index into the
+// original. normalizeComposition() collapses whitespace and cannot be used
+// here; runs of blanks are skipped while scanning instead.
+// Lazily filled table of normalized UTF-16 code units (0 = not computed).
+const normalizedCodes = new Uint16Array(0x10000);
+
+function normalizeChar(ch) {
+  if (ch.length !== 1) return normalizeCharUncached(ch);
+  const code = ch.charCodeAt(0);
+  if (!normalizedCodes[code]) {
+    normalizedCodes[code] = normalizeCharUncached(ch).charCodeAt(0);
+  }
+  return String.fromCharCode(normalizedCodes[code]);
+}
+
+function normalizeCharUncached(ch) {
+  const lower = ch.toLowerCase();
+  if (lower.length !== 1) return ch;
+  if (LOOKALIKES[lower]) return LOOKALIKES[lower];
+  if (lower >= '\u2010' && lower <= '\u2015') return '-';
+  if (SPACE_RE.test(lower)) return ' ';
+  return lower;
+}
+
+function normalizeTerm(term) {
+  return term.split('').map(normalizeChar).join('').replace(/ +/g, ' ');
+}
+
+const automaton = new AhoCorasick();
+
+// Terms ending in "*" are stems and match any word they start; other terms
+// match whole words or phrases only.
+function addTerm(term, entry) {
+  const stem = term.endsWith('*');
+  automaton.add(normalizeTerm(stem ? term.slice(0, -1) : term), { ...entry, stem });
+}
+
+for (const [code, info] of Object.entries(additives)) {
+  const entry = { id: code, category: 'additive' };
+  const digits = code.slice(1).toLowerCase();
+  for (const sep of ['', ' ', '-']) addTerm(`e${sep}${digits}`, entry);
+  for (const alias of info.aliases) addTerm(alias, entry);
+}
+
+for (const [id, info] of Object.entries(allergens)) {
+  for (const term of info.terms) addTerm(term, { id, category: 'allergen' });
+  // "кокосовое молоко" is not milk: exclusions are matched like terms and
+  // suppress the allergen matches they overlap.
+  for (const term of info.exclude) addTerm(term, { id, category: 'exclude' });
+}
+
+automaton.build();
+
+// E-numbers missing from the table still count as additives.
+const E_CODE_RE = /(?<![\p{L}\p{N}])[eе] ?[-\u2010-\u2015]? ?(\d{3,4})([a-zа-я]?)(?![\p{L}\p{N}])/giu;
+
+// Returns [{ start, end, id, category }] sorted by start, where id is an
+// E-code ("E621") or allergen key ("milk") and category is 'additive' or
+// 'allergen'. Offsets index into `text`.
+function findMatches(text) {
+  text = String(text || '');
+
+  // Normalized characters fed to the automaton, with their offsets in text.
+  const fedCodes = new Uint16Array(text.length);
+  const offsets = new Int32Array(text.length);
+  let n = 0;
+  for (let i = 0; i < text.length; i++) {
+    const code = text.charCodeAt(i);
+    if (!normalizedCodes[code]) normalizeChar(text[i]);
+    const ch = normalizedCodes[code];
+    if (ch === SPACE && (n === 0 || fedCodes[n - 1] === SPACE)) continue;
+    fedCodes[n] = ch;
+    offsets[n++] = i;
+  }
+  const fed = utf16.decode(fedCodes.subarray(0, n));
+
+  const found = [];
+  const excluded = [];
+  automaton.scan(fed, (end, length, entry) => {
+    const start = offsets[end - length];
+    let last = offsets[end - 1] + 1;
+    if (isWordChar(text[start - 1])) return;
+    if (entry.stem) {
+      while (isWordChar(text[last])) last++;
+    } else if (isWordChar(text[last])) {
+      return;
+    }
+    const match = { start, end: last, id: entry.id, category: entry.category };
+    (entry.category === 'exclude' ? excluded : found).push(match);
+  });
+
+  // Characters covered by an exclusion, per allergen; linear in the total
+  // length of the excluded spans.
+  const covered = new Map();
+  for (const x of excluded) {
+    if (!covered.has(x.id)) covered.set(x.id, new Uint8Array(text.length));
+    covered.get(x.id).fill(1, x.start, x.end);
+  }
+  const isExcluded = (m) => {
+    const marks = covered.get(m.id);
+    if (!marks) return false;
+    for (let i = m.start; i < m.end; i++) if (marks[i]) return true;
+    return false;
+  };
+
+  const matches = found.filter((m) => m.category !== 'allergen' || !isExcluded(m));
+  const additiveStarts = new Set(matches.filter((m) => m.category === 'additive').map((m) => m.start));
+
+  for (const m of text.matchAll(E_CODE_RE)) {
+    const start = m.index;
+    const end = start + m[0].length;
+    if (additiveStarts.has(start)) continue;
+    const code = `E${m[1]}${normalizeChar(m[2])}`;
+    const id = additives[code] || !additives[`E${m[1]}`] ? code : `E${m[1]}`;
+    matches.push({ start, end, id, category: 'additive' });
+  }
+
+  return matches.sort((a, b) => a.start - b.start || b.end - a.end);
+}
+
+module.exports = { findMatches, automatonStates: automaton.states };
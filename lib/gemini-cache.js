@@ -0,0 +1,24 @@
+'use strict';
+
+const { sha256, LruCache, cacheMetricFamilies } = require('./cache');
+const { normalizeComposition } = require('./text');
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// Gemini answers keyed on the normalized composition, so the same label
+// typed, pasted or re-recognized slightly differently shares one entry.
+
+const resultCache = new LruCache({
+  maxEntries: Number(process.env.GEMINI_CACHE_MAX_ENTRIES) || 1000,
+  maxBytes: Number(process.env.GEMINI_CACHE_MAX_BYTES) || 16 * 1024 * 1024,
+  ttlMs: Number(process.env.GEMINI_CACHE_TTL_MS) || 6 * 60 * 60 * 1000
+});
+
+function resultCacheKey(promptVersion, mode, text) {
+  return sha256(`${promptVersion}:${mode}:${normalizeComposition(text)}`);
+}
+
+stats.register('geminiCache', () => resultCache.stats());
+metrics.collect(() => cacheMetricFamilies('gemini', { memory: resultCache.stats() }, metrics.labels));
+
+module.exports = { resultCache, resultCacheKey };
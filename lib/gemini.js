@@ -0,0 +1,263 @@
+'use strict';
+
+const upstream = require('./upstream');
+const { resultCache, resultCacheKey } = require('./gemini-cache');
+const { JsonFieldScanner } = require('./json-stream');
+const { SingleFlight } = require('./singleflight');
+const stats = require('./stats');
+const timing = require('./timing');
+const { breaker, parseRetryAfter } = require('./resilience');
+const { limiter, limiterOptionsFromEnv } = require('./limiter');
+const { analysisText } = require('./composition');
+
+// Gemini prompts and client shared by the gemini and pipeline handlers.
+
+const GEMINI_MODEL_URL = process.env.GEMINI_MODEL_URL ||
+  'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash';
+const GEMINI_URL = `${GEMINI_MODEL_URL}:generateContent`;
+const GEMINI_STREAM_URL = `${GEMINI_MODEL_URL}:streamGenerateContent`;
+
+// Identical compositions in flight at the same time share one Gemini call,
+// keyed like the result cache.
+const inflight = new SingleFlight();
+
+stats.register('geminiCoalescing', () => inflight.stats());
+
+const geminiLimiter = limiter('gemini', limiterOptionsFromEnv('GEMINI'));
+const geminiBreaker = breaker('gemini');
+
+// Bump whenever a prompt below changes so cached answers to the old prompt
+// are no longer served.
+const PROMPT_VERSION = 1;
+
+const PROMPTS = {
+  recipes: (text) => `Based on this product, suggest 3-5 creative recipes as JSON only: {"recipes": [{"name": "name", "type": "cocktail|dish|beverage", "description": "desc", "ingredients": [], "steps": []}]}. Product: ${text}`,
+  analyze: (text) => `Analyze this product composition. Return JSON only: {"productName": "name", "verdict": "verdict", "riskLevel": "safe|moderate|high", "highlights": ["E-code with description"], "allergens": [], "features": [], "advice": "tip"}. Composition: ${text}`
+};
+
+function requestBody(prompt) {
+  return JSON.stringify({
+    contents: [{
+      parts: [{ text: prompt }]
+    }],
+    generationConfig: {
+      temperature: 0.7,
+      maxOutputTokens: 2048
+    }
+  });
+}
+
+// The model is asked for JSON only but may still wrap it in prose or a
+// code fence; take the outermost object.
+function parseModelJson(content) {
+  if (!content) {
+    throw new Error('No content in response');
+  }
+  const jsonMatch = content.match(/\{[\s\S]*\}/);
+  if (!jsonMatch) {
+    throw new Error('No JSON in response');
+  }
+  try {
+    return JSON.parse(jsonMatch[0]);
+  } catch (e) {
+    throw new Error('JSON parse: ' + e.message);
+  }
+}
+
+function upstreamError(status, raw, headers) {
+  let message = `Gemini HTTP ${status}`;
+  try {
+    message = JSON.parse(raw)?.error?.message || message;
+  } catch (e) {
+    // Not JSON; keep the status line.
+  }
+  const err = new Error(message);
+  err.status = status;
+  err.retryAfter = parseRetryAfter(headers['retry-after']);
+  return err;
+}
+
+async function callGemini(apiKey, prompt) {
+  const url = new URL(GEMINI_URL);
+  url.searchParams.set('key', apiKey);
+
+  // One limiter slot per attempt, retries included.
+  const response = await geminiBreaker.execute(() => geminiLimiter.run(async () => {
+    const r = await upstream.request(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: requestBody(prompt),
+      timeoutMs: 30000,
+      label: 'gemini'
+    });
+    if (r.status < 200 || r.status >= 300) throw upstreamError(r.status, r.raw, r.headers);
+    return r;
+  }));
+
+  let parsed;
+  try {
+    parsed = JSON.parse(response.raw);
+  } catch (e) {
+    throw new Error('Response parse: ' + e.message);
+  }
+  if (parsed.error) {
+    throw new Error(parsed.error.message || 'Gemini error');
+  }
+  const endParse = timing.span('gemini-json');
+  try {
+    return parseModelJson(parsed.candidates?.[0]?.content?.parts?.[0]?.text || '');
+  } finally {
+    endParse();
+  }
+}
+
+// streamGenerateContent with alt=sse: every `data:` line is a complete
+// GenerateContentResponse carrying the next slice of the answer. Calls
+// onText with each slice and resolves with the whole answer text. Only
+// opening the stream is retried; nothing has been forwarded by then. Each
+// attempt takes its own limiter slot, and the successful one holds it
+// until the stream has been read.
+async function streamGemini(apiKey, prompt, onText) {
+  const url = new URL(GEMINI_STREAM_URL);
+  url.searchParams.set('alt', 'sse');
+  url.searchParams.set('key', apiKey);
+
+  let release = null;
+  const res = await geminiBreaker.execute(async () => {
+    const done = await geminiLimiter.acquire();
+    try {
+      const r = await upstream.open(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: requestBody(prompt),
+        timeoutMs: 30000,
+        label: 'gemini'
+      });
+      if (r.statusCode !== 200) {
+        let raw = '';
+        r.setEncoding('utf8');
+        for await (const chunk of r) raw += chunk;
+        throw upstreamError(r.statusCode, raw, r.headers);
+      }
+      release = done;
+      return r;
+    } finally {
+      if (release !== done) done();
+    }
+  });
+  try {
+    return await readStream(res, onText);
+  } finally {
+    release();
+  }
+}
+
+async function readStream(res, onText) {
+  res.setEncoding('utf8');
+
+  let buf = '';
+  let content = '';
+  for await (const chunk of res) {
+    buf += chunk;
+    let idx;
+    while ((idx = buf.indexOf('\n')) !== -1) {
+      const line = buf.slice(0, idx).trim();
+      buf = buf.slice(idx + 1);
+      if (!line.startsWith('data:')) continue;
+      let payload;
+      try {
+        payload = JSON.parse(line.slice(5));
+      } catch (e) {
+        throw new Error('Stream parse: ' + e.message);
+      }
+      if (payload.error) {
+        throw new Error(payload.error.message || 'Gemini error');
+      }
+      const parts = payload.candidates?.[0]?.content?.parts || [];
+      const piece = parts.filter((p) => !p.thought).map((p) => p.text || '').join('');
+      if (piece) {
+        content += piece;
+        onText(piece);
+      }
+    }
+  }
+  return content;
+}
+
+// Analyses get only the composition part of the label text
+// (lib/composition.js); recipes get all of it.
+function promptInput(kind, text) {
+  return kind === 'analyze' ? analysisText(text) : text;
+}
+
+// Runs `mode` ('analyze' or 'recipes') for a composition, serving repeated
+// compositions from the result cache.
+async function analyzeComposition(apiKey, mode, fullText) {
+  const kind = mode === 'recipes' ? 'recipes' : 'analyze';
+  const text = promptInput(kind, fullText);
+  const cacheKey = resultCacheKey(PROMPT_VERSION, kind, text);
+  const cached = resultCache.get(cacheKey);
+  if (cached !== undefined) {
+    timing.record('gemini-cache', 0, 'hit');
+    return { result: cached, cached: true };
+  }
+
+  const result = await inflight.do(cacheKey, async () => {
+    const answer = await callGemini(apiKey, PROMPTS[kind](text));
+    resultCache.set(cacheKey, answer);
+    return answer;
+  });
+  return { result, cached: false };
+}
+
+// The cached answer for a composition, or undefined. Never calls Gemini.
+function cachedComposition(mode, text) {
+  const kind = mode === 'recipes' ? 'recipes' : 'analyze';
+  return resultCache.get(resultCacheKey(PROMPT_VERSION, kind, promptInput(kind, text)));
+}
+
+// Streaming counterpart of analyzeComposition: onField(key, value) fires
+// for each top-level field of the answer as soon as it is complete. Cache
+// hits replay the stored fields immediately.
+async function streamComposition(apiKey, mode, fullText, onField) {
+  const kind = mode === 'recipes' ? 'recipes' : 'analyze';
+  const text = promptInput(kind, fullText);
+  const cacheKey = resultCacheKey(PROMPT_VERSION, kind, text);
+  const cached = resultCache.get(cacheKey);
+  if (cached !== undefined) {
+    timing.record('gemini-cache', 0, 'hit');
+    for (const [key, value] of Object.entries(cached)) onField(key, value);
+    return { result: cached, cached: true };
+  }
+
+  const seen = new Set();
+  const forward = (key, value) => {
+    seen.add(key);
+    onField(key, value);
+  };
+  const result = await inflight.do(cacheKey, async (emit) => {
+    const scanner = new JsonFieldScanner();
+    const content = await streamGemini(apiKey, PROMPTS[kind](text), (piece) => {
+      for (const field of scanner.push(piece)) emit(field.key, field.value);
+    });
+    const answer = parseModelJson(content);
+    resultCache.set(cacheKey, answer);
+    return answer;
+  }, forward);
+
+  // Joined a non-streaming call, or the scanner skipped a malformed field.
+  for (const [key, value] of Object.entries(result)) {
+    if (!seen.has(key)) onField(key, value);
+  }
+  return { result, cached: false };
+}
+
+module.exports = {
+  PROMPT_VERSION,
+  PROMPTS,
+  callGemini,
+  streamGemini,
+  analyzeComposition,
+  streamComposition,
+  cachedComposition
+};
@@ -0,0 +1,183 @@
+'use strict';
+
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// Request hedging: when a call has not finished by the observed p95, a
+// second identical call is sent and whichever succeeds first wins; the
+// other is aborted. The hedge delay adapts to recent latencies, and the
+// share of calls that may be hedged is capped so quota use stays bounded.
+
+const hedgesTotal = metrics.counter('upstream_hedges_total', 'Hedged upstream requests by outcome', ['upstream', 'outcome']);
+
+// Recent latencies in a ring buffer; the percentile is recomputed only
+// every `recomputeEvery` samples.
+class LatencyTracker {
+  constructor({ size = 256, recomputeEvery = 16 } = {}) {
+    this.samples = new Float64Array(size);
+    this.count = 0;
+    this.recomputeEvery = recomputeEvery;
+    this.cached = null;
+    this.sinceRecompute = 0;
+  }
+
+  record(ms) {
+    this.samples[this.count % this.samples.length] = ms;
+    this.count++;
+    this.sinceRecompute++;
+  }
+
+  percentile(p) {
+    const n = Math.min(this.count, this.samples.length);
+    if (!n) return null;
+    if (this.cached && this.cached.p === p && this.sinceRecompute < this.recomputeEvery) {
+      return this.cached.value;
+    }
+    const sorted = Array.from(this.samples.subarray(0, n)).sort((a, b) => a - b);
+    const value = sorted[Math.min(n - 1, Math.ceil((p / 100) * n) - 1)];
+    this.cached = { p, value };
+    this.sinceRecompute = 0;
+    return value;
+  }
+}
+
+class Hedger {
+  constructor(name, {
+    maxRate = 0.05,
+    percentile = 95,
+    minSamples = 20,
+    minDelayMs = 50,
+    maxDelayMs = 10000,
+    windowMs = 60000
+  } = {}) {
+    this.name = name;
+    this.maxRate = maxRate;
+    this.percentileValue = percentile;
+    this.minSamples = minSamples;
+    this.minDelayMs = minDelayMs;
+    this.maxDelayMs = maxDelayMs;
+    this.windowMs = windowMs;
+    this.latency = new LatencyTracker();
+    // Calls and hedges in the current and previous window.
+    this.window = { start: Date.now(), calls: 0, hedges: 0, prevCalls: 0, prevHedges: 0 };
+    this.counters = { calls: 0, hedged: 0, hedgeWon: 0, capped: 0 };
+  }
+
+  // Null until enough latencies have been seen to estimate the tail.
+  delay() {
+    if (this.latency.count < this.minSamples) return null;
+    const p = this.latency.percentile(this.percentileValue);
+    return Math.min(this.maxDelayMs, Math.max(this.minDelayMs, p));
+  }
+
+  _roll() {
+    const w = this.window;
+    const now = Date.now();
+    if (now - w.start < this.windowMs) return;
+    const stale = now - w.start >= 2 * this.windowMs;
+    w.prevCalls = stale ? 0 : w.calls;
+    w.prevHedges = stale ? 0 : w.hedges;
+    w.calls = 0;
+    w.hedges = 0;
+    w.start = now;
+  }
+
+  _mayHedge() {
+    const w = this.window;
+    const calls = w.calls + w.prevCalls;
+    return w.hedges + w.prevHedges + 1 <= this.maxRate * calls;
+  }
+
+  // attempt(signal) performs one call and should abort when signal fires.
+  // Resolves with the first successful attempt; rejects only when every
+  // attempt that was started has failed.
+  run(attempt) {
+    this._roll();
+    this.window.calls++;
+    this.counters.calls++;
+
+    const delay = this.maxRate > 0 ? this.delay() : null;
+    const controllers = [];
+    const started = Date.now();
+
+    return new Promise((resolve, reject) => {
+      let settled = false;
+      let running = 0;
+      let timer = null;
+
+      const launch = (hedge) => {
+        const controller = new AbortController();
+        controllers.push(controller);
+        running++;
+        Promise.resolve()
+          .then(() => attempt(controller.signal))
+          .then((result) => {
+            running--;
+            if (settled) return;
+            settled = true;
+            clearTimeout(timer);
+            // The primary's latency, timed from the start of the call: when
+            // the hedge wins the primary has taken at least this long, and
+            // timing the hedge from its own start would drag the p95 (and
+            // so the hedge delay) down.
+            this.latency.record(Date.now() - started);
+            if (hedge) {
+              this.counters.hedgeWon++;
+              hedgesTotal.inc({ upstream: this.name, outcome: 'won' });
+            }
+            for (const c of controllers) if (c !== controller) c.abort();
+            resolve(result);
+          }, (err) => {
+            running--;
+            if (settled) return;
+            // A failure before the hedge went out is final (retries are the
+            // breaker's job); otherwise wait for the other attempt.
+            if (running === 0) {
+              settled = true;
+              clearTimeout(timer);
+              reject(err);
+            }
+          });
+      };
+
+      launch(false);
+      if (delay === null) return;
+
+      timer = setTimeout(() => {
+        if (settled) return;
+        this._roll();
+        if (!this._mayHedge()) {
+          this.counters.capped++;
+          return;
+        }
+        this.window.hedges++;
+        this.counters.hedged++;
+        hedgesTotal.inc({ upstream: this.name, outcome: 'sent' });
+        launch(true);
+      }, delay);
+    });
+  }
+
+  stats() {
+    return { ...this.counters, delayMs: this.delay() || 0 };
+  }
+}
+
+const hedgers = new Map();
+
+function hedger(name, options) {
+  let h = hedgers.get(name);
+  if (!h) {
+    h = new Hedger(name, options);
+    hedgers.set(name, h);
+  }
+  return h;
+}
+
+stats.register('hedging', () => {
+  const out = {};
+  for (const [name, h] of hedgers) out[name] = h.stats();
+  return out;
+});
+
+module.exports = { LatencyTracker, Hedger, hedger };
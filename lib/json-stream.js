@@ -0,0 +1,102 @@
+'use strict';
+
+// Incremental scanner over a JSON object arriving in pieces (a model's
+// streamed answer, possibly wrapped in prose or a ```json fence). `push()`
+// returns the top-level fields whose values became complete with that
+// piece, so callers can act on each field before the object is closed.
+// Every character is looked at once.
+class JsonFieldScanner {
+  constructor() {
+    this.buf = '';
+    this.pos = 0;
+    this.depth = 0;
+    this.inString = false;
+    this.escaped = false;
+    this.started = false;
+    this.done = false;
+    this.expect = 'key';
+    this.key = null;
+    this.tokenStart = -1;
+  }
+
+  push(chunk) {
+    this.buf += chunk;
+    const fields = [];
+
+    for (; this.pos < this.buf.length && !this.done; this.pos++) {
+      const ch = this.buf[this.pos];
+
+      if (this.inString) {
+        if (this.escaped) {
+          this.escaped = false;
+        } else if (ch === '\\') {
+          this.escaped = true;
+        } else if (ch === '"') {
+          this.inString = false;
+          if (this.depth === 1 && this.expect === 'in-key') {
+            this.key = JSON.parse(this.buf.slice(this.tokenStart, this.pos + 1));
+            this.expect = 'colon';
+          }
+        }
+        continue;
+      }
+
+      if (!this.started) {
+        if (ch === '{') {
+          this.started = true;
+          this.depth = 1;
+        }
+        continue;
+      }
+
+      if (ch === '"') {
+        this.inString = true;
+        if (this.depth === 1 && this.expect === 'key') {
+          this.tokenStart = this.pos;
+          this.expect = 'in-key';
+        } else if (this.depth === 1 && this.expect === 'value') {
+          this.tokenStart = this.pos;
+          this.expect = 'in-value';
+        }
+      } else if (ch === '{' || ch === '[') {
+        if (this.depth === 1 && this.expect === 'value') {
+          this.tokenStart = this.pos;
+          this.expect = 'in-value';
+        }
+        this.depth++;
+      } else if (ch === '}' || ch === ']') {
+        this.depth--;
+        if (this.depth === 0) {
+          this._emit(fields);
+          this.done = true;
+        }
+      } else if (this.depth === 1) {
+        if (ch === ':' && this.expect === 'colon') {
+          this.expect = 'value';
+        } else if (ch === ',') {
+          this._emit(fields);
+          this.expect = 'key';
+        } else if (this.expect === 'value' && !/\s/.test(ch)) {
+          // Bare literal: number, true, false or null.
+          this.tokenStart = this.pos;
+          this.expect = 'in-value';
+        }
+      }
+    }
+
+    return fields;
+  }
+
+  _emit(fields) {
+    if (this.expect !== 'in-value') return;
+    const raw = this.buf.slice(this.tokenStart, this.pos).trim();
+    this.expect = 'key';
+    try {
+      fields.push({ key: this.key, value: JSON.parse(raw) });
+    } catch (e) {
+      // Malformed value; the final parse of the whole answer reports it.
+    }
+  }
+}
+
+module.exports = { JsonFieldScanner };
@@ -0,0 +1,235 @@
+'use strict';
+
+// Text reconstruction for Yandex Vision responses (textAnnotation, at the
+// top level or under `result`). Reading order comes from block geometry:
+//   - blocks spanning at least half the text width (titles, full-width
+//     paragraphs) cut the page into horizontal sections;
+//   - within a section, blocks whose x-ranges overlap form a column, and
+//     columns are read left to right, each top to bottom;
+//   - a section that forms a table (a nutrition table, say) is read row by
+//     row instead: several columns of one-line blocks whose rows line up
+//     with one cell per column, and whose cells after the first column are
+//     short and contain a digit. Other one-line blocks side by side are
+//     ordinary columns.
+// Lines are separated by newlines, blocks by a blank line, cells of a grid
+// row by a space. Every step is a sort or a binary search, so the whole
+// pass is O(n log n) in the number of blocks and lines; the text is
+// appended to one string as blocks are visited. Responses without
+// geometry keep the upstream block order.
+
+// Part of the OCR cache key: bump when the output for a given response
+// changes, so cached text from an older extractor is not served.
+const LAYOUT_VERSION = 'layout2';
+
+const SPAN_RATIO = 0.5;
+// Longest value cell of a table ("3,5 г", "250 ккал / 1046 кДж").
+const MAX_CELL_CHARS = 24;
+
+function boundsOf(node) {
+  const vertices = node?.boundingBox?.vertices;
+  if (!Array.isArray(vertices) || !vertices.length) return null;
+  let minX = Infinity;
+  let minY = Infinity;
+  let maxX = -Infinity;
+  let maxY = -Infinity;
+  for (const v of vertices) {
+    // Yandex sends coordinates as strings and omits zero values.
+    const x = Number(v?.x) || 0;
+    const y = Number(v?.y) || 0;
+    if (x < minX) minX = x;
+    if (x > maxX) maxX = x;
+    if (y < minY) minY = y;
+    if (y > maxY) maxY = y;
+  }
+  return { minX, minY, maxX, maxY };
+}
+
+function lineText(line) {
+  if (!line) return '';
+  if (typeof line.text === 'string') return line.text;
+  if (!Array.isArray(line.words)) return '';
+  let text = '';
+  for (const word of line.words) {
+    if (!word?.text) continue;
+    text += text ? ` ${word.text}` : word.text;
+  }
+  return text;
+}
+
+const byMinX = (a, b) => a.minX - b.minX;
+const byMinY = (a, b) => a.minY - b.minY || a.minX - b.minX;
+
+// Lines of a block in top-to-bottom order. Upstream order is kept when it
+// already is (the usual case) or when geometry is missing.
+function orderedLines(block) {
+  const lines = Array.isArray(block.lines) ? block.lines : [];
+  let prevY = -Infinity;
+  let sorted = true;
+  for (const line of lines) {
+    const bounds = boundsOf(line);
+    if (!bounds) return lines;
+    if (bounds.minY < prevY) sorted = false;
+    prevY = bounds.minY;
+  }
+  if (sorted) return lines;
+  return lines
+    .map((line) => ({ line, ...boundsOf(line) }))
+    .sort(byMinY)
+    .map((entry) => entry.line);
+}
+
+// Accumulates the output; separators are only written between pieces of
+// text, so there is nothing to trim afterwards.
+class TextBuilder {
+  constructor() {
+    this.text = '';
+    this.pending = '';
+  }
+
+  append(piece, separator) {
+    if (!piece) return;
+    if (this.text) this.text += this.pending || separator;
+    this.text += piece;
+    this.pending = '';
+  }
+
+  // Forces a blank line before whatever is appended next.
+  paragraph() {
+    if (this.text) this.pending = '\n\n';
+  }
+}
+
+function writeBlock(out, item) {
+  out.paragraph();
+  for (const line of orderedLines(item.block)) out.append(lineText(line), '\n');
+}
+
+function blockText(block) {
+  let text = '';
+  for (const line of orderedLines(block)) {
+    const piece = lineText(line);
+    if (piece) text += text ? ` ${piece}` : piece;
+  }
+  return text;
+}
+
+// Rows of a table, or null when the section is not one. Blocks whose top
+// lies above the bottom of the row's first block share its row; every row
+// must hold exactly one block per column, and the value cells must be
+// short and numeric-looking.
+function tableRows(items, columnCount) {
+  const sorted = [...items].sort(byMinY);
+  const rows = [];
+  let start = 0;
+  while (start < sorted.length) {
+    const rowBottom = sorted[start].maxY;
+    let end = start + 1;
+    while (end < sorted.length && sorted[end].minY < rowBottom) end++;
+    if (end - start !== columnCount) return null;
+    const row = sorted.slice(start, end).sort(byMinX);
+    for (let i = 0; i < row.length; i++) {
+      if (row[i].column !== i) return null;
+      row[i].text = blockText(row[i].block);
+      if (i > 0 && (row[i].text.length > MAX_CELL_CHARS || !/\d/.test(row[i].text))) return null;
+    }
+    rows.push(row);
+    start = end;
+  }
+  return rows;
+}
+
+// One line per row, cells separated by a space.
+function writeTable(out, rows) {
+  out.paragraph();
+  for (const row of rows) {
+    let first = true;
+    for (const item of row) {
+      if (!item.text) continue;
+      out.append(item.text, first ? '\n' : ' ');
+      first = false;
+    }
+  }
+}
+
+function writeSection(out, items) {
+  if (!items.length) return;
+  items.sort(byMinX);
+  const columns = [];
+  let column = null;
+  let columnMaxX = -Infinity;
+  let singleLines = true;
+  for (const item of items) {
+    if (!column || item.minX >= columnMaxX) {
+      column = [];
+      columns.push(column);
+      columnMaxX = item.maxX;
+    } else if (item.maxX > columnMaxX) {
+      columnMaxX = item.maxX;
+    }
+    item.column = columns.length - 1;
+    column.push(item);
+    if (Array.isArray(item.block.lines) && item.block.lines.length > 1) singleLines = false;
+  }
+
+  const rows = columns.length > 1 && singleLines ? tableRows(items, columns.length) : null;
+  if (rows) {
+    writeTable(out, rows);
+    return;
+  }
+  for (const col of columns) {
+    col.sort(byMinY);
+    for (const item of col) writeBlock(out, item);
+  }
+}
+
+// Index of the first separator whose top is below y.
+function sectionIndex(separators, y) {
+  let lo = 0;
+  let hi = separators.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (separators[mid].minY <= y) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+function extractText(resp) {
+  const annotation = resp?.textAnnotation || resp?.result?.textAnnotation || null;
+  const blocks = Array.isArray(annotation?.blocks) ? annotation.blocks : [];
+  const out = new TextBuilder();
+
+  const items = [];
+  let left = Infinity;
+  let right = -Infinity;
+  for (const block of blocks) {
+    const bounds = boundsOf(block);
+    if (!bounds) {
+      for (const b of blocks) writeBlock(out, { block: b });
+      return out.text;
+    }
+    if (bounds.minX < left) left = bounds.minX;
+    if (bounds.maxX > right) right = bounds.maxX;
+    items.push({ block, ...bounds });
+  }
+
+  const spanWidth = (right - left) * SPAN_RATIO;
+  const separators = [];
+  const flow = [];
+  for (const item of items) {
+    if (item.maxX - item.minX >= spanWidth) separators.push(item);
+    else flow.push(item);
+  }
+  separators.sort(byMinY);
+
+  const sections = Array.from({ length: separators.length + 1 }, () => []);
+  for (const item of flow) sections[sectionIndex(separators, item.minY)].push(item);
+
+  for (let i = 0; i < sections.length; i++) {
+    writeSection(out, sections[i]);
+    if (i < separators.length) writeBlock(out, separators[i]);
+  }
+  return out.text;
+}
+
+module.exports = { LAYOUT_VERSION, extractText };
@@ -0,0 +1,283 @@
+'use strict';
+
+const { AsyncLocalStorage } = require('async_hooks');
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// Per-upstream governor: a token bucket caps the request rate, maxInFlight
+// caps concurrency, and callers beyond either wait in a bounded queue that
+// serves interactive work before batch work. Waiters whose deadline passes
+// are shed with a 503 before the upstream is ever called. Limits apply per
+// process (per worker in cluster mode).
+
+const PRIORITIES = ['interactive', 'batch'];
+
+const priorityContext = new AsyncLocalStorage();
+
+const queueWait = metrics.histogram('upstream_queue_wait_seconds', 'Time spent queued before an upstream call', ['upstream', 'priority']);
+const shedTotal = metrics.counter('upstream_shed_total', 'Upstream calls rejected by the limiter', ['upstream', 'reason']);
+const limiters = new Map();
+
+// `X-Priority: batch` or `?priority=batch` marks background work; anything
+// else is interactive.
+function priorityOf(req) {
+  const header = (req.headers['x-priority'] || '').toString().toLowerCase();
+  if (PRIORITIES.includes(header)) return header;
+  const match = /[?&]priority=(\w+)/.exec(req.url || '');
+  return match && PRIORITIES.includes(match[1]) ? match[1] : 'interactive';
+}
+
+function withPriority(priority, fn) {
+  return priorityContext.run(priority, fn);
+}
+
+function currentPriority() {
+  return priorityContext.getStore() || 'interactive';
+}
+
+function overloaded(name, reason, retryAfter) {
+  const err = new Error(`${name} is overloaded, try again later`);
+  err.code = 'UPSTREAM_OVERLOADED';
+  err.reason = reason;
+  err.statusCode = 503;
+  err.retryAfter = retryAfter;
+  return err;
+}
+
+function aborted() {
+  const err = new Error('The operation was aborted');
+  err.name = 'AbortError';
+  err.code = 'ABORT_ERR';
+  return err;
+}
+
+class Limiter {
+  constructor(name, {
+    ratePerSecond = 0,
+    burst = ratePerSecond,
+    maxInFlight = Infinity,
+    maxQueue = 100,
+    queueTimeoutMs = { interactive: 5000, batch: 30000 }
+  } = {}) {
+    this.name = name;
+    this.ratePerSecond = ratePerSecond;
+    this.burst = Math.max(1, burst);
+    this.tokens = this.burst;
+    this.refilledAt = Date.now();
+    this.maxInFlight = maxInFlight;
+    this.maxQueue = maxQueue;
+    this.queueTimeoutMs = queueTimeoutMs;
+    this.inFlight = 0;
+    // One FIFO per priority, highest priority first.
+    this.queues = PRIORITIES.map(() => []);
+    this.queued = 0;
+    this.timer = null;
+    this.counters = { admitted: 0, queued: 0, shedQueueFull: 0, shedDeadline: 0 };
+  }
+
+  _refill() {
+    if (!this.ratePerSecond) return;
+    const now = Date.now();
+    this.tokens = Math.min(this.burst, this.tokens + ((now - this.refilledAt) / 1000) * this.ratePerSecond);
+    this.refilledAt = now;
+  }
+
+  _canStart() {
+    if (this.inFlight >= this.maxInFlight) return false;
+    if (!this.ratePerSecond) return true;
+    this._refill();
+    return this.tokens >= 1;
+  }
+
+  _start() {
+    this.inFlight++;
+    if (this.ratePerSecond) this.tokens -= 1;
+    this.counters.admitted++;
+  }
+
+  _dequeue() {
+    for (const queue of this.queues) {
+      if (queue.length) {
+        this.queued--;
+        return queue.shift();
+      }
+    }
+    return null;
+  }
+
+  // Starts queued waiters while there is capacity; if only tokens are
+  // missing, wakes up again when the next one is due.
+  _drain() {
+    while (this.queued && this._canStart()) {
+      const waiter = this._dequeue();
+      clearTimeout(waiter.timer);
+      this._start();
+      waiter.resolve();
+    }
+    if (this.queued && !this.timer && this.inFlight < this.maxInFlight && this.ratePerSecond) {
+      const wait = Math.ceil(((1 - this.tokens) / this.ratePerSecond) * 1000);
+      this.timer = setTimeout(() => {
+        this.timer = null;
+        this._drain();
+      }, Math.max(1, wait));
+    }
+  }
+
+  _retryAfter() {
+    const perSecond = this.ratePerSecond || 1;
+    return Math.max(1, Math.ceil(this.queued / perSecond));
+  }
+
+  _shed(reason) {
+    shedTotal.inc({ upstream: this.name, reason });
+    if (reason === 'queue_full') this.counters.shedQueueFull++;
+    else this.counters.shedDeadline++;
+    return overloaded(this.name, reason, this._retryAfter());
+  }
+
+  _acquire(priority, signal) {
+    const rank = Math.max(0, PRIORITIES.indexOf(priority));
+    if (signal?.aborted) return Promise.reject(aborted());
+    if (!this.queued && this._canStart()) {
+      this._start();
+      return Promise.resolve();
+    }
+
+    if (this.queued >= this.maxQueue) {
+      // Make room by shedding the newest waiter of a lower priority.
+      const victimQueue = this.queues.slice(rank + 1).reverse().find((q) => q.length);
+      if (!victimQueue) return Promise.reject(this._shed('queue_full'));
+      const victim = victimQueue.pop();
+      this.queued--;
+      clearTimeout(victim.timer);
+      victim.reject(this._shed('queue_full'));
+    }
+
+    this.counters.queued++;
+    return new Promise((resolve, reject) => {
+      const remove = () => {
+        const queue = this.queues[rank];
+        const idx = queue.indexOf(waiter);
+        if (idx === -1) return false;
+        queue.splice(idx, 1);
+        this.queued--;
+        return true;
+      };
+      const onAbort = () => {
+        if (!remove()) return;
+        clearTimeout(waiter.timer);
+        reject(aborted());
+      };
+      const waiter = {
+        resolve: () => {
+          signal?.removeEventListener('abort', onAbort);
+          resolve();
+        },
+        reject: (err) => {
+          signal?.removeEventListener('abort', onAbort);
+          reject(err);
+        },
+        timer: null
+      };
+      const timeout = this.queueTimeoutMs[priority] ?? this.queueTimeoutMs.interactive;
+      waiter.timer = setTimeout(() => {
+        remove();
+        waiter.reject(this._shed('deadline'));
+      }, timeout);
+      signal?.addEventListener('abort', onAbort, { once: true });
+      this.queues[rank].push(waiter);
+      this.queued++;
+      this._drain();
+    });
+  }
+
+  // Waits for a rate token and an in-flight slot and resolves with the
+  // function that gives the slot back. Priority defaults to the current
+  // request's (see withPriority()); aborting `signal` while queued gives
+  // up the place in the queue.
+  async acquire({ priority = currentPriority(), signal = null } = {}) {
+    const observe = queueWait.startTimer({ upstream: this.name, priority });
+    await this._acquire(priority, signal);
+    observe();
+    let released = false;
+    return () => {
+      if (released) return;
+      released = true;
+      this.inFlight--;
+      this._drain();
+    };
+  }
+
+  // Runs fn once admitted, holding the slot until it settles. Every
+  // upstream attempt (retry or hedge) should go through here on its own.
+  async run(fn, options) {
+    const release = await this.acquire(options);
+    try {
+      return await fn();
+    } finally {
+      release();
+    }
+  }
+
+  stats() {
+    const depth = {};
+    PRIORITIES.forEach((p, i) => { depth[p] = this.queues[i].length; });
+    return { ...this.counters, inFlight: this.inFlight, queueDepth: depth };
+  }
+}
+
+function limiter(name, options) {
+  let l = limiters.get(name);
+  if (!l) {
+    l = new Limiter(name, options);
+    limiters.set(name, l);
+  }
+  return l;
+}
+
+// Options from <PREFIX>_RATE_LIMIT (requests/s, 0 = unlimited),
+// <PREFIX>_MAX_IN_FLIGHT and the shared UPSTREAM_QUEUE_* settings.
+function limiterOptionsFromEnv(prefix, env = process.env) {
+  const rate = Number(env[`${prefix}_RATE_LIMIT`]) || 0;
+  return {
+    ratePerSecond: rate,
+    burst: Number(env[`${prefix}_RATE_BURST`]) || rate,
+    maxInFlight: Number(env[`${prefix}_MAX_IN_FLIGHT`]) || Infinity,
+    maxQueue: Number(env.UPSTREAM_QUEUE_SIZE) || 100,
+    queueTimeoutMs: {
+      interactive: Number(env.UPSTREAM_QUEUE_TIMEOUT_MS) || 5000,
+      batch: Number(env.UPSTREAM_BATCH_QUEUE_TIMEOUT_MS) || 30000
+    }
+  };
+}
+
+stats.register('limiters', () => {
+  const out = {};
+  for (const [name, l] of limiters) out[name] = l.stats();
+  return out;
+});
+
+metrics.collect(() => {
+  const depth = {};
+  const inFlight = {};
+  for (const [name, l] of limiters) {
+    PRIORITIES.forEach((priority, i) => {
+      depth[metrics.labels({ upstream: name, priority })] = l.queues[i].length;
+    });
+    inFlight[metrics.labels({ upstream: name })] = l.inFlight;
+  }
+  return {
+    upstream_queue_depth: { type: 'gauge', help: 'Calls waiting in the upstream limiter queue', series: depth },
+    upstream_in_flight: { type: 'gauge', help: 'Upstream calls admitted and not yet finished', series: inFlight }
+  };
+});
+
+module.exports = {
+  PRIORITIES,
+  Limiter,
+  limiter,
+  limiterOptionsFromEnv,
+  priorityOf,
+  withPriority,
+  currentPriority
+};
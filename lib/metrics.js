@@ -0,0 +1,236 @@
+'use strict';
+
+const stats = require('./stats');
+
+// Counters, gauges and fixed-bucket histograms rendered in the Prometheus
+// text format. Recording is a Map lookup plus a few additions, cheap enough
+// for every request. Each metric keeps at most MAX_SERIES label
+// combinations; later ones are folded into a single overflow series.
+// Snapshots are plain objects so lib/stats.js can sum them across cluster
+// workers.
+
+const MAX_SERIES = 200;
+const OVERFLOW_KEY = 'overflow="true"';
+
+// Seconds, from a cache hit to the slowest upstream call.
+const LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+// Bytes, from a short composition to the upload limit.
+const SIZE_BUCKETS = [1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7];
+
+const families = new Map();
+const callbacks = [];
+
+function escapeLabel(value) {
+  return String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+function labelKey(labelNames, labels) {
+  if (!labelNames.length) return '';
+  return labelNames.map((name) => `${name}="${escapeLabel(labels[name] ?? '')}"`).join(',');
+}
+
+class Metric {
+  constructor(type, name, help, labelNames) {
+    this.type = type;
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.series = new Map();
+  }
+
+  _series(labels) {
+    const key = labelKey(this.labelNames, labels || {});
+    let series = this.series.get(key);
+    if (series === undefined) {
+      if (this.series.size >= MAX_SERIES) return this._overflowSeries();
+      series = this._create();
+      this.series.set(key, series);
+    }
+    return series;
+  }
+
+  _overflowSeries() {
+    let series = this.series.get(OVERFLOW_KEY);
+    if (series === undefined) {
+      series = this._create();
+      this.series.set(OVERFLOW_KEY, series);
+    }
+    return series;
+  }
+
+  _create() {
+    return { value: 0 };
+  }
+
+  snapshot() {
+    const series = {};
+    for (const [key, s] of this.series) series[key] = s.value;
+    return { type: this.type, help: this.help, series };
+  }
+}
+
+class Counter extends Metric {
+  constructor(name, help, labelNames = []) {
+    super('counter', name, help, labelNames);
+  }
+
+  inc(labels, by = 1) {
+    this._series(labels).value += by;
+  }
+}
+
+class Gauge extends Metric {
+  constructor(name, help, labelNames = []) {
+    super('gauge', name, help, labelNames);
+  }
+
+  inc(labels, by = 1) {
+    this._series(labels).value += by;
+  }
+
+  dec(labels, by = 1) {
+    this._series(labels).value -= by;
+  }
+
+  set(labels, value) {
+    this._series(labels).value = value;
+  }
+}
+
+class Histogram extends Metric {
+  constructor(name, help, labelNames = [], buckets = LATENCY_BUCKETS) {
+    super('histogram', name, help, labelNames);
+    this.buckets = buckets;
+  }
+
+  _create() {
+    return { counts: new Array(this.buckets.length + 1).fill(0), sum: 0, count: 0 };
+  }
+
+  observe(labels, value) {
+    const s = this._series(labels);
+    let i = 0;
+    while (i < this.buckets.length && value > this.buckets[i]) i++;
+    s.counts[i]++;
+    s.sum += value;
+    s.count++;
+  }
+
+  // Starts a timer; calling the returned function observes the elapsed
+  // seconds (labels may be completed at that point).
+  startTimer(labels = {}) {
+    const begin = process.hrtime.bigint();
+    return (more) => {
+      this.observe(more ? { ...labels, ...more } : labels, Number(process.hrtime.bigint() - begin) / 1e9);
+    };
+  }
+
+  // Bucket counts are keyed by upper bound so snapshots from several
+  // workers can be summed key by key.
+  snapshot() {
+    const series = {};
+    for (const [key, s] of this.series) {
+      const buckets = {};
+      this.buckets.forEach((le, i) => { buckets[le] = s.counts[i]; });
+      buckets['+Inf'] = s.counts[this.buckets.length];
+      series[key] = { buckets, sum: s.sum, count: s.count };
+    }
+    return { type: this.type, help: this.help, series };
+  }
+}
+
+function define(MetricClass, name, ...args) {
+  let metric = families.get(name);
+  if (!metric) {
+    metric = new MetricClass(name, ...args);
+    families.set(name, metric);
+  }
+  return metric;
+}
+
+function counter(name, help, labelNames) {
+  return define(Counter, name, help, labelNames);
+}
+
+function gauge(name, help, labelNames) {
+  return define(Gauge, name, help, labelNames);
+}
+
+function histogram(name, help, labelNames, buckets) {
+  return define(Histogram, name, help, labelNames, buckets);
+}
+
+// For values other modules already count (cache hits, pool sizes): fn is
+// called at scrape time and returns { name: { type, help, series } } in
+// snapshot form, with series keyed by label string (see labels()).
+function collect(fn) {
+  callbacks.push(fn);
+}
+
+function labels(obj) {
+  return labelKey(Object.keys(obj), obj);
+}
+
+function snapshot() {
+  const out = {};
+  for (const [name, metric] of families) out[name] = metric.snapshot();
+  for (const fn of callbacks) {
+    for (const [name, family] of Object.entries(fn())) {
+      out[name] = out[name]
+        ? { ...out[name], series: { ...out[name].series, ...family.series } }
+        : family;
+    }
+  }
+  return out;
+}
+
+function formatValue(value) {
+  if (value === Infinity) return '+Inf';
+  if (value === -Infinity) return '-Inf';
+  return String(value);
+}
+
+function withLabel(key, extra) {
+  return `{${key ? `${key},${extra}` : extra}}`;
+}
+
+// Renders a (possibly merged) snapshot in the Prometheus text format 0.0.4.
+function render(snap) {
+  const lines = [];
+  for (const [name, family] of Object.entries(snap)) {
+    lines.push(`# HELP ${name} ${family.help}`);
+    lines.push(`# TYPE ${name} ${family.type}`);
+    for (const [key, value] of Object.entries(family.series)) {
+      if (family.type !== 'histogram') {
+        lines.push(`${name}${key ? `{${key}}` : ''} ${formatValue(value)}`);
+        continue;
+      }
+      // Integer-like keys ("1", "10") enumerate first; restore bound order.
+      const bounds = Object.keys(value.buckets).filter((le) => le !== '+Inf').sort((a, b) => a - b);
+      let cumulative = 0;
+      for (const le of bounds) {
+        cumulative += value.buckets[le];
+        lines.push(`${name}_bucket${withLabel(key, `le="${le}"`)} ${cumulative}`);
+      }
+      lines.push(`${name}_bucket${withLabel(key, 'le="+Inf"')} ${value.count}`);
+      lines.push(`${name}_sum${key ? `{${key}}` : ''} ${formatValue(value.sum)}`);
+      lines.push(`${name}_count${key ? `{${key}}` : ''} ${value.count}`);
+    }
+  }
+  return lines.join('\n') + '\n';
+}
+
+stats.register('metrics', snapshot);
+
+module.exports = {
+  LATENCY_BUCKETS,
+  SIZE_BUCKETS,
+  counter,
+  gauge,
+  histogram,
+  collect,
+  labels,
+  snapshot,
+  render
+};
@@ -0,0 +1,38 @@
+'use strict';
+
+const { instrument } = require('./timing');
+const { admitRequest } = require('./admission');
+const { compressResponses } = require('./compress');
+const { priorityOf, withPriority } = require('./limiter');
+
+// Request middleware for the API handlers, in one place so each handler
+// gets every layer exactly once:
+//   - JSON bodies are compressed when the client accepts it (lib/compress.js);
+//   - the request is timed and counted (lib/timing.js);
+//   - clients over their rate or concurrency allowance (lib/admission.js)
+//     get a 429 instead of the handler;
+//   - the request's priority (lib/limiter.js) is made current for the
+//     upstream limiters.
+function apiHandler(route, handler) {
+  return compressed(instrument(route, (req, res) => {
+    const release = admitRequest(route, req, res);
+    if (!release) return undefined;
+    res.once('close', release);
+    return withPriority(priorityOf(req), () => handler(req, res));
+  }));
+}
+
+// For /api/stats and /api/metrics: compressed, but neither timed nor rate
+// limited, so scrapes do not show up in the numbers they report.
+function statsHandler(handler) {
+  return compressed(handler);
+}
+
+function compressed(handler) {
+  return (req, res) => {
+    compressResponses(req, res);
+    return handler(req, res);
+  };
+}
+
+module.exports = { apiHandler, statsHandler };
@@ -0,0 +1,38 @@
+'use strict';
+
+const { sha256, LruCache, DiskCache, TieredCache, cacheMetricFamilies } = require('./cache');
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// OCR results keyed by the image content, so retries and re-uploads of the
+// same photo never reach Yandex twice.
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+const ocrCache = new TieredCache({
+  memory: new LruCache({
+    maxEntries: Number(process.env.OCR_CACHE_MAX_ENTRIES) || 500
+  }),
+  disk: process.env.OCR_CACHE_DIR
+    ? new DiskCache({
+      dir: process.env.OCR_CACHE_DIR,
+      ttlMs: Number(process.env.OCR_CACHE_TTL_MS) || 7 * DAY_MS,
+      maxEntries: Number(process.env.OCR_CACHE_DISK_MAX_ENTRIES) || 20000,
+      maxBytes: Number(process.env.OCR_CACHE_DISK_MAX_BYTES) || 256 * 1024 * 1024
+    })
+    : null
+});
+
+function imageHash(bytes) {
+  return sha256(bytes);
+}
+
+function ocrCacheKey(hash, { model, languageCodes, variant = '' }) {
+  const langs = [...languageCodes].map(String).sort().join(',');
+  return `${hash}:${model}:${langs}:${variant}`;
+}
+
+stats.register('ocrCache', () => ocrCache.stats());
+metrics.collect(() => cacheMetricFamilies('ocr', ocrCache.stats(), metrics.labels));
+
+module.exports = { ocrCache, imageHash, ocrCacheKey };
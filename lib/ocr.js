@@ -0,0 +1,96 @@
+'use strict';
+
+const upstream = require('./upstream');
+const { ocrCache, imageHash, ocrCacheKey } = require('./ocr-cache');
+const { LAYOUT_VERSION, extractText } = require('./layout');
+const { SingleFlight } = require('./singleflight');
+const stats = require('./stats');
+const timing = require('./timing');
+const { breaker, parseRetryAfter } = require('./resilience');
+const { hedger } = require('./hedge');
+const { limiter, limiterOptionsFromEnv } = require('./limiter');
+
+// Yandex Vision OCR call shared by the OCR and pipeline handlers: cache
+// lookup, upstream request and text extraction.
+
+// Overridable for the benchmark's mock upstream (bench/mock-upstream.js).
+const OCR_URL = process.env.YANDEX_OCR_URL || 'https://ocr.api.cloud.yandex.net/ocr/v1/recognizeText';
+
+// Identical images in flight at the same time share one upstream call.
+const inflight = new SingleFlight();
+
+stats.register('ocrCoalescing', () => inflight.stats());
+
+const ocrLimiter = limiter('ocr', limiterOptionsFromEnv('OCR'));
+const ocrBreaker = breaker('ocr');
+
+// Hedging is off unless OCR_HEDGE_RATE (the largest share of calls that
+// may send a second request) is set.
+const ocrHedger = hedger('ocr', { maxRate: Number(process.env.OCR_HEDGE_RATE) || 0 });
+
+// `upload` is the object produced by lib/upload.js. Resolves to the
+// extracted text (lib/layout.js), whether it came from the cache, and the raw upstream
+// response (null on a cache hit). Non-2xx upstream answers reject with an
+// error carrying `status` and `details`. While the OCR breaker is open,
+// when the limiter sheds the call, or when Yandex answered with a
+// Retry-After, it rejects with statusCode 503 and `retryAfter` (seconds).
+// Concurrent calls for the same cache key are coalesced.
+async function recognizeText(upload, { apiKey, timeoutMs = 20000 }) {
+  const { bytes, model, languageCodes } = upload;
+  const endHash = timing.span('hash');
+  const cacheKey = ocrCacheKey(imageHash(bytes), { model, languageCodes, variant: LAYOUT_VERSION });
+  endHash();
+  const cached = await timing.measure('ocr-cache', () => ocrCache.get(cacheKey));
+  if (cached !== undefined) {
+    return { text: cached, cached: true, response: null };
+  }
+
+  return inflight.do(cacheKey, async () => {
+    // The limiter is inside the breaker and the hedger, so retries and
+    // hedges each take a token and an in-flight slot.
+    const response = await ocrBreaker.execute(() => ocrHedger.run((signal) => ocrLimiter.run(() => (
+      requestOcr(apiKey, upload, timeoutMs, signal)
+    ), { signal })));
+
+    const endExtract = timing.span('extract');
+    const text = extractText(response.json);
+    endExtract();
+    if (text) ocrCache.set(cacheKey, text);
+    return { text, cached: false, response: response.json };
+  });
+}
+
+// One recognizeText attempt; non-2xx answers are thrown so the breaker can
+// decide whether to retry.
+async function requestOcr(apiKey, { content, mimeType, model, languageCodes }, timeoutMs, signal) {
+  const response = await upstream.request(OCR_URL, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Api-Key ${apiKey}`,
+      'x-data-logging-enabled': 'false'
+    },
+    body: JSON.stringify({ mimeType, languageCodes, model, content }),
+    timeoutMs,
+    label: 'ocr',
+    signal
+  });
+
+  if (response.status < 200 || response.status >= 300) {
+    const err = new Error('Yandex Vision OCR request failed');
+    err.statusCode = 502;
+    err.status = response.status;
+    err.details = response.json || response.raw;
+    err.retryAfter = parseRetryAfter(response.headers['retry-after']);
+    throw err;
+  }
+  return response;
+}
+
+// Cached text for an image the caller has already hashed (imageHash()),
+// or undefined. Never calls Yandex.
+function cachedText(hash, { model = 'page', languageCodes }) {
+  return ocrCache.get(ocrCacheKey(hash, { model, languageCodes, variant: LAYOUT_VERSION }));
+}
+
+module.exports = { recognizeText, cachedText };
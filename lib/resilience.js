@@ -0,0 +1,251 @@
+'use strict';
+
+const stats = require('./stats');
+const metrics = require('./metrics');
+
+// Per-upstream failure handling: a circuit breaker that fails fast while an
+// upstream is down (probing it with one request after a cooldown), retries
+// with full-jitter backoff for transient failures, and a retry budget so
+// retries cannot multiply load during a brownout.
+
+const RETRYABLE_STATUSES = new Set([408, 429, 500, 502, 503, 504]);
+const RETRYABLE_CODES = new Set(['ECONNRESET', 'ECONNREFUSED', 'EPIPE', 'ETIMEDOUT', 'EAI_AGAIN']);
+
+const DEFAULTS = {
+  maxAttempts: Number(process.env.UPSTREAM_MAX_ATTEMPTS) || 2,
+  baseDelayMs: 100,
+  maxDelayMs: 1000,
+  failureThreshold: Number(process.env.BREAKER_FAILURE_THRESHOLD) || 5,
+  cooldownMs: Number(process.env.BREAKER_COOLDOWN_MS) || 10000,
+  // Retries may add at most this fraction on top of first attempts, plus
+  // a small floor so a quiet instance can still retry.
+  budgetRatio: 0.1,
+  budgetMinPerSecond: 1,
+  budgetWindowMs: 10000
+};
+
+const retriesTotal = metrics.counter('upstream_retries_total', 'Upstream attempts that were retries', ['upstream']);
+const rejectedTotal = metrics.counter('upstream_rejected_total', 'Calls failed fast by an open circuit breaker', ['upstream']);
+const breakers = new Map();
+
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+// Transient failures worth another attempt. Upstream timeouts are not:
+// the attempt already took the full timeout.
+function isRetryable(err) {
+  if (!err) return false;
+  if (err.status) return RETRYABLE_STATUSES.has(err.status);
+  return RETRYABLE_CODES.has(err.code);
+}
+
+// Failures that say something about the upstream's health (as opposed to
+// a bad request from us) and count towards opening the breaker.
+function isUpstreamFailure(err) {
+  if (!err) return false;
+  if (err.status) return err.status >= 500 || err.status === 429 || err.status === 408;
+  return true;
+}
+
+// Seconds from a Retry-After header (delta-seconds or HTTP date).
+function parseRetryAfter(value) {
+  if (!value) return null;
+  const seconds = Number(value);
+  if (Number.isFinite(seconds)) return Math.max(0, Math.ceil(seconds));
+  const date = Date.parse(value);
+  return Number.isNaN(date) ? null : Math.max(0, Math.ceil((date - Date.now()) / 1000));
+}
+
+// An upstream failure that says when to come back is passed on as a 503
+// carrying that hint, so handlers answer with Retry-After instead of a
+// plain 502.
+function withRetryHint(err) {
+  if (err.retryAfter != null) {
+    err.statusCode = 503;
+    err.retryAfter = Math.max(1, err.retryAfter);
+  }
+  return err;
+}
+
+// Counts first attempts and retries in one-second slots over a sliding
+// window.
+class RetryBudget {
+  constructor({ ratio, minPerSecond, windowMs }) {
+    this.ratio = ratio;
+    this.minPerSecond = minPerSecond;
+    this.slots = Math.max(1, Math.round(windowMs / 1000));
+    this.requests = new Array(this.slots).fill(0);
+    this.retries = new Array(this.slots).fill(0);
+    this.second = 0;
+  }
+
+  _advance() {
+    const now = Math.floor(Date.now() / 1000);
+    const gap = Math.min(this.slots, now - this.second);
+    for (let i = 1; i <= gap; i++) {
+      const slot = (this.second + i) % this.slots;
+      this.requests[slot] = 0;
+      this.retries[slot] = 0;
+    }
+    if (gap > 0) this.second = now;
+    return now % this.slots;
+  }
+
+  recordRequest() {
+    this.requests[this._advance()]++;
+  }
+
+  tryRetry() {
+    const slot = this._advance();
+    const requests = this.requests.reduce((a, b) => a + b, 0);
+    const retries = this.retries.reduce((a, b) => a + b, 0);
+    if (retries >= this.minPerSecond * this.slots + this.ratio * requests) return false;
+    this.retries[slot]++;
+    return true;
+  }
+}
+
+class CircuitBreaker {
+  constructor(name, options = {}) {
+    this.name = name;
+    this.options = { ...DEFAULTS, ...options };
+    this.state = 'closed';
+    this.failures = 0;
+    this.openedAt = 0;
+    this.probing = false;
+    this.budget = new RetryBudget({
+      ratio: this.options.budgetRatio,
+      minPerSecond: this.options.budgetMinPerSecond,
+      windowMs: this.options.budgetWindowMs
+    });
+    this.counters = { calls: 0, retries: 0, rejected: 0, opened: 0, budgetExhausted: 0 };
+  }
+
+  retryAfterSeconds() {
+    return Math.max(1, Math.ceil((this.openedAt + this.options.cooldownMs - Date.now()) / 1000));
+  }
+
+  // Whether a call may go out now. After the cooldown one probe is let
+  // through (half-open); its outcome closes or re-opens the breaker.
+  _admit() {
+    if (this.state === 'closed') return true;
+    if (this.state === 'open' && Date.now() - this.openedAt >= this.options.cooldownMs) {
+      this.state = 'half-open';
+    }
+    if (this.state === 'half-open' && !this.probing) {
+      this.probing = true;
+      return true;
+    }
+    return false;
+  }
+
+  _success() {
+    this.failures = 0;
+    this.probing = false;
+    this.state = 'closed';
+  }
+
+  _failure() {
+    this.probing = false;
+    this.failures++;
+    if (this.state === 'half-open' || this.failures >= this.options.failureThreshold) {
+      if (this.state !== 'open') this.counters.opened++;
+      this.state = 'open';
+      this.openedAt = Date.now();
+    }
+  }
+
+  _rejected() {
+    this.counters.rejected++;
+    rejectedTotal.inc({ upstream: this.name });
+    const err = new Error(`${this.name} is temporarily unavailable`);
+    err.code = 'CIRCUIT_OPEN';
+    err.statusCode = 503;
+    err.retryAfter = this.retryAfterSeconds();
+    return err;
+  }
+
+  // Runs attempt(n) (n = 1, 2, ...) until it succeeds, fails with a
+  // non-retryable error, or attempts / budget run out. Errors thrown by
+  // attempt() should carry `status` for HTTP failures and `retryAfter`
+  // (seconds) when the upstream sent one; the final error then gets
+  // statusCode 503.
+  async execute(attempt) {
+    this.counters.calls++;
+    this.budget.recordRequest();
+
+    for (let n = 1; ; n++) {
+      if (!this._admit()) throw this._rejected();
+
+      try {
+        const result = await attempt(n);
+        this._success();
+        return result;
+      } catch (err) {
+        // Shed by the limiter before reaching the upstream: says nothing
+        // about its health and is not worth retrying here.
+        if (err.code === 'UPSTREAM_OVERLOADED') {
+          this.probing = false;
+          throw err;
+        }
+        if (isUpstreamFailure(err)) {
+          this._failure();
+        } else {
+          this._success();
+        }
+
+        const canRetry = isRetryable(err) && n < this.options.maxAttempts;
+        if (!canRetry) throw withRetryHint(err);
+        if (!this.budget.tryRetry()) {
+          this.counters.budgetExhausted++;
+          throw withRetryHint(err);
+        }
+
+        // Full jitter, but never sooner than the upstream asked for. A
+        // longer wait is left to the client.
+        const backoff = Math.random() * Math.min(this.options.maxDelayMs, this.options.baseDelayMs * 2 ** (n - 1));
+        const asked = (err.retryAfter || 0) * 1000;
+        if (asked > this.options.maxDelayMs) throw withRetryHint(err);
+        await sleep(Math.max(backoff, asked));
+        this.counters.retries++;
+        retriesTotal.inc({ upstream: this.name });
+      }
+    }
+  }
+
+  stats() {
+    return { ...this.counters, open: this.state === 'closed' ? 0 : 1 };
+  }
+}
+
+function breaker(name, options) {
+  let b = breakers.get(name);
+  if (!b) {
+    b = new CircuitBreaker(name, options);
+    breakers.set(name, b);
+  }
+  return b;
+}
+
+stats.register('breakers', () => {
+  const out = {};
+  for (const [name, b] of breakers) out[name] = b.stats();
+  return out;
+});
+
+metrics.collect(() => {
+  const series = {};
+  for (const [name, b] of breakers) series[metrics.labels({ upstream: name })] = b.stats().open;
+  return {
+    upstream_breaker_open: { type: 'gauge', help: 'Circuit breakers not closed (open or half-open)', series }
+  };
+});
+
+module.exports = {
+  CircuitBreaker,
+  RetryBudget,
+  breaker,
+  isRetryable,
+  parseRetryAfter
+};
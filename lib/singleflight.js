@@ -0,0 +1,44 @@
+'use strict';
+
+// Collapses concurrent calls with the same key onto one execution. The
+// call is not tied to any caller, so a waiter that goes away (client
+// disconnect) leaves it running for the others.
+//
+// `fn` receives an `emit(...args)` function for progress events. Callers
+// that pass `onEvent` get the events emitted so far replayed, then live
+// ones until the call settles.
+class SingleFlight {
+  constructor() {
+    this.calls = new Map();
+    this.counters = { leaders: 0, shared: 0 };
+  }
+
+  do(key, fn, onEvent = null) {
+    let call = this.calls.get(key);
+    if (call) {
+      this.counters.shared++;
+    } else {
+      this.counters.leaders++;
+      call = { events: [], listeners: new Set() };
+      const emit = (...args) => {
+        call.events.push(args);
+        for (const listener of call.listeners) listener(...args);
+      };
+      call.promise = Promise.resolve()
+        .then(() => fn(emit))
+        .finally(() => this.calls.delete(key));
+      this.calls.set(key, call);
+    }
+
+    if (!onEvent) return call.promise;
+    for (const args of call.events) onEvent(...args);
+    call.listeners.add(onEvent);
+    return call.promise.finally(() => call.listeners.delete(onEvent));
+  }
+
+  stats() {
+    return { ...this.counters, inFlight: this.calls.size };
+  }
+}
+
+module.exports = { SingleFlight };
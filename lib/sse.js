@@ -0,0 +1,28 @@
+'use strict';
+
+// Minimal Server-Sent Events writer for handlers that stream stage results.
+
+function wantsEventStream(req) {
+  const query = req.query || Object.fromEntries(new URL(req.url || '/', 'http://localhost').searchParams);
+  if (query.stream === '1' || query.stream === 'true') return true;
+  return (req.headers.accept || '').includes('text/event-stream');
+}
+
+function openEventStream(res) {
+  res.statusCode = 200;
+  res.setHeader('Content-Type', 'text/event-stream; charset=utf-8');
+  res.setHeader('Cache-Control', 'no-cache, no-transform');
+  res.setHeader('X-Accel-Buffering', 'no');
+  if (typeof res.flushHeaders === 'function') res.flushHeaders();
+
+  return {
+    send(event, data) {
+      if (!res.writableEnded) res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+    },
+    close() {
+      if (!res.writableEnded) res.end();
+    }
+  };
+}
+
+module.exports = { wantsEventStream, openEventStream };
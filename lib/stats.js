@@ -0,0 +1,106 @@
+'use strict';
+
+const cluster = require('cluster');
+
+// Process-wide registry of stats sources. Modules register a snapshot
+// function at load time; `collect()` gathers them for the stats endpoint.
+// In cluster mode `collectAll()` asks the primary to merge every worker's
+// snapshot instead (mergeSnapshots()).
+
+const CLUSTER_TIMEOUT_MS = 2000;
+
+const sources = new Map();
+const pending = new Map();
+let seq = 0;
+
+function register(name, snapshot) {
+  sources.set(name, snapshot);
+}
+
+function collect() {
+  const out = {};
+  for (const [name, snapshot] of sources) {
+    out[name] = snapshot();
+  }
+  return out;
+}
+
+// Leaves that are not counts: a flag, a setting or derived value that is
+// the same kind of thing in every worker, or the usage of a resource the
+// workers share (the disk cache directory). Matched against the end of the
+// key path; their aggregate is the largest value instead of the sum.
+const MAX_PATHS = [['delayMs'], ['open'], ['disk', 'files'], ['disk', 'bytes']];
+
+function takesMax(path) {
+  if (/^max[A-Z]/.test(path[path.length - 1])) return true;
+  return MAX_PATHS.some((suffix) => suffix.length <= path.length &&
+    suffix.every((key, i) => path[path.length - suffix.length + i] === key));
+}
+
+// Merges worker snapshots key by key: counts are summed, the leaves above
+// take the maximum, and other values (strings) are kept when every worker
+// agrees or listed once each when they differ.
+function mergeSnapshots(snapshots) {
+  const merge = (a, b, path) => {
+    if (typeof a === 'number' && typeof b === 'number') {
+      return takesMax(path) ? Math.max(a, b) : a + b;
+    }
+    if (a && b && typeof a === 'object' && typeof b === 'object' && !Array.isArray(a)) {
+      const out = { ...a };
+      for (const [key, value] of Object.entries(b)) {
+        out[key] = key in out ? merge(out[key], value, [...path, key]) : value;
+      }
+      return out;
+    }
+    if (a === undefined || a === null) return b;
+    if (b === undefined || b === null) return a;
+    const seen = a instanceof Distinct ? a : new Distinct([a]);
+    if (!seen.values.some((v) => v === b)) seen.values.push(b);
+    return seen;
+  };
+  const merged = snapshots.reduce((acc, s) => merge(acc, s, []), {});
+  return JSON.parse(JSON.stringify(merged));
+}
+
+// Differing non-numeric values of one leaf; serialized as the single value
+// when all workers agree, else as the list of values.
+class Distinct {
+  constructor(values) {
+    this.values = values;
+  }
+
+  toJSON() {
+    return this.values.length === 1 ? this.values[0] : this.values;
+  }
+}
+
+function collectAll() {
+  if (!cluster.isWorker || !process.send) return Promise.resolve(collect());
+  const id = `${process.pid}:${++seq}`;
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      resolve(collect());
+    }, CLUSTER_TIMEOUT_MS);
+    pending.set(id, (stats) => {
+      clearTimeout(timer);
+      resolve(stats);
+    });
+    process.send({ type: 'stats:request', id });
+  });
+}
+
+if (cluster.isWorker) {
+  process.on('message', (msg) => {
+    if (!msg) return;
+    if (msg.type === 'stats:collect') {
+      process.send({ type: 'stats:report', id: msg.id, stats: collect() });
+    } else if (msg.type === 'stats:response' && pending.has(msg.id)) {
+      const done = pending.get(msg.id);
+      pending.delete(msg.id);
+      done(msg.stats);
+    }
+  });
+}
+
+module.exports = { register, collect, collectAll, mergeSnapshots };
@@ -0,0 +1,36 @@
+'use strict';
+
+// Cyrillic letters that OCR routinely confuses with Latin ones (and vice
+// versa). Folding both scripts onto Latin makes "Е621" and "E621", or
+// "сахар" typed with a Latin "c", compare equal.
+const LOOKALIKES = {
+  'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h',
+  'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i'
+};
+
+const LOOKALIKE_RE = new RegExp(`[${Object.keys(LOOKALIKES).join('')}]`, 'g');
+
+function foldLookalikes(text) {
+  return text.replace(LOOKALIKE_RE, (ch) => LOOKALIKES[ch]);
+}
+
+function normalizeComposition(text) {
+  return foldLookalikes(String(text || '').normalize('NFKC').toLowerCase())
+    .replace(/[\u2010-\u2015]/g, '-')
+    .replace(/\s+/g, ' ')
+    .trim();
+}
+
+// Tidies OCR output before it is sent for analysis: words hyphenated
+// across line breaks are re-joined and runs of blank space collapsed.
+function cleanupOcrText(text) {
+  return String(text || '')
+    .replace(/\r\n?/g, '\n')
+    .replace(/([A-Za-zА-Яа-яЁё])-\n([a-zа-яё])/g, '$1$2')
+    .replace(/[ \t]+/g, ' ')
+    .replace(/ ?\n ?/g, '\n')
+    .replace(/\n{3,}/g, '\n\n')
+    .trim();
+}
+
+module.exports = { LOOKALIKES, foldLookalikes, normalizeComposition, cleanupOcrText };
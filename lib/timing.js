@@ -0,0 +1,146 @@
+'use strict';
+
+const { AsyncLocalStorage } = require('async_hooks');
+const { performance } = require('perf_hooks');
+const metrics = require('./metrics');
+
+// Per-request stage timings. instrument() runs a handler with a Timing in
+// async context; lib code records spans into it with span()/measure()
+// without the timer being passed around (no-ops outside a request). The
+// spans go out as a Server-Timing header and one JSON log line per
+// request.
+
+const context = new AsyncLocalStorage();
+
+const LOG_TIMINGS = process.env.LOG_TIMINGS !== '0';
+
+const httpRequests = metrics.counter('http_requests_total', 'API requests by route, method and status', ['route', 'method', 'status']);
+const httpDuration = metrics.histogram('http_request_duration_seconds', 'API request duration', ['route']);
+const httpInFlight = metrics.gauge('http_requests_in_flight', 'API requests being handled', ['route']);
+const requestSize = metrics.histogram('http_request_size_bytes', 'API request body size (Content-Length)', ['route'], metrics.SIZE_BUCKETS);
+const responseSize = metrics.histogram('http_response_size_bytes', 'API response body size', ['route'], metrics.SIZE_BUCKETS);
+
+class Timing {
+  constructor() {
+    this.origin = performance.now();
+    this.entries = [];
+  }
+
+  record(name, ms, desc) {
+    this.entries.push({ name, dur: ms, desc });
+  }
+
+  // Returns end(), which records and returns the elapsed milliseconds.
+  start(name, desc) {
+    const begin = performance.now();
+    let done = false;
+    return () => {
+      const ms = performance.now() - begin;
+      if (!done) this.record(name, ms, desc);
+      done = true;
+      return ms;
+    };
+  }
+
+  elapsed() {
+    return performance.now() - this.origin;
+  }
+
+  toJSON() {
+    const stages = {};
+    for (const { name, dur } of this.entries) {
+      stages[name] = Number(((stages[name] || 0) + dur).toFixed(2));
+    }
+    return { totalMs: Number(this.elapsed().toFixed(2)), stages };
+  }
+
+  header() {
+    const parts = this.entries.map(({ name, dur, desc }) => (
+      `${name};dur=${dur.toFixed(1)}${desc ? `;desc="${desc.replace(/["\\]/g, '')}"` : ''}`
+    ));
+    parts.push(`total;dur=${this.elapsed().toFixed(1)}`);
+    return parts.join(', ');
+  }
+}
+
+function current() {
+  return context.getStore() || null;
+}
+
+const noop = () => 0;
+
+function span(name, desc) {
+  const timing = current();
+  return timing ? timing.start(name, desc) : noop;
+}
+
+function record(name, ms, desc) {
+  const timing = current();
+  if (timing) timing.record(name, ms, desc);
+}
+
+// Times fn (sync or async) as one span and returns its result.
+async function measure(name, fn) {
+  const end = span(name);
+  try {
+    return await fn();
+  } finally {
+    end();
+  }
+}
+
+// Wraps a (req, res) handler: the Server-Timing header is added when the
+// response head is written (streamed responses carry the spans recorded up
+// to that point), the full breakdown is logged when it finishes, and the
+// request is counted in the http_* metrics. The API handlers get this
+// through lib/middleware.js.
+function instrument(route, handler) {
+  const labels = { route };
+  return (req, res) => {
+    const timing = new Timing();
+    const writeHead = res.writeHead;
+    res.writeHead = function (...args) {
+      if (!res.headersSent) {
+        res.setHeader('Server-Timing', timing.header());
+        res.setHeader('Timing-Allow-Origin', '*');
+      }
+      return writeHead.apply(this, args);
+    };
+
+    let sent = 0;
+    const write = res.write;
+    const end = res.end;
+    res.write = function (chunk, ...args) {
+      if (chunk && typeof chunk !== 'function') sent += Buffer.byteLength(chunk);
+      return write.call(this, chunk, ...args);
+    };
+    res.end = function (chunk, ...args) {
+      if (chunk && typeof chunk !== 'function') sent += Buffer.byteLength(chunk);
+      return end.call(this, chunk, ...args);
+    };
+
+    const length = Number(req.headers['content-length']);
+    if (length > 0) requestSize.observe(labels, length);
+    httpInFlight.inc(labels);
+    res.once('close', () => {
+      httpInFlight.dec(labels);
+      const elapsed = timing.elapsed();
+      httpRequests.inc({ route, method: req.method, status: res.statusCode });
+      httpDuration.observe(labels, elapsed / 1000);
+      responseSize.observe(labels, sent);
+      if (LOG_TIMINGS) {
+        console.log(JSON.stringify({
+          type: 'timing',
+          route,
+          method: req.method,
+          status: res.statusCode,
+          ...timing.toJSON()
+        }));
+      }
+    });
+
+    return context.run(timing, () => handler(req, res));
+  };
+}
+
+module.exports = { Timing, instrument, current, span, record, measure };
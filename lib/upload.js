@@ -0,0 +1,281 @@
+'use strict';
+
+// Reads the image for an OCR request in any of the accepted encodings:
+//   - application/json with a base64 `image` field (original API),
+//   - raw bytes (application/octet-stream, image/*, application/pdf),
+//   - multipart/form-data with an `image` file part.
+// Binary bodies are consumed straight from the request stream; the parsed
+// fields are the same in every case.
+
+const timing = require('./timing');
+
+const MAX_UPLOAD_BYTES = Number(process.env.MAX_UPLOAD_BYTES) || 10 * 1024 * 1024;
+
+const DEFAULT_LANGUAGES = ['ru', 'en'];
+
+const MIME_TYPES = {
+  'image/jpeg': 'JPEG',
+  'image/jpg': 'JPEG',
+  'image/png': 'PNG',
+  'application/pdf': 'PDF'
+};
+
+const SUPPORTED_MIME_TYPES = new Set(Object.values(MIME_TYPES));
+
+function httpError(statusCode, message) {
+  const err = new Error(message);
+  err.statusCode = statusCode;
+  return err;
+}
+
+// Stops taking in a body that is being rejected. Destroying the request
+// would reset the connection, usually before the client has read the
+// error; the rest of the body is left unread instead (see
+// sendUploadError()).
+function stopReading(req) {
+  req.removeAllListeners('data');
+  req.pause();
+}
+
+// Answers a failed upload. When the body was not read to the end,
+// Connection: close lets Node close the socket once the answer is out
+// rather than read the rest to reuse the connection.
+function sendUploadError(req, res, err) {
+  if (!req.complete) res.setHeader('Connection', 'close');
+  res.status(err.statusCode || 400).json({ error: err.message });
+}
+
+function sniffMimeType(bytes) {
+  if (bytes.length >= 4 && bytes[0] === 0x89 && bytes[1] === 0x50 && bytes[2] === 0x4e && bytes[3] === 0x47) return 'PNG';
+  if (bytes.length >= 4 && bytes.toString('latin1', 0, 4) === '%PDF') return 'PDF';
+  return 'JPEG';
+}
+
+function parseLanguageCodes(value) {
+  if (Array.isArray(value)) return value.map(String);
+  if (typeof value !== 'string' || !value.trim()) return DEFAULT_LANGUAGES;
+  const trimmed = value.trim();
+  if (trimmed.startsWith('[')) {
+    try {
+      return JSON.parse(trimmed).map(String);
+    } catch (e) {
+      return DEFAULT_LANGUAGES;
+    }
+  }
+  return trimmed.split(',').map((s) => s.trim()).filter(Boolean);
+}
+
+function queryOf(req) {
+  if (req.query) return req.query;
+  return Object.fromEntries(new URL(req.url || '/', 'http://localhost').searchParams);
+}
+
+function baseType(contentType) {
+  return contentType.split(';')[0].trim().toLowerCase();
+}
+
+function readStream(req, limit) {
+  return new Promise((resolve, reject) => {
+    const declared = Number(req.headers['content-length']);
+    if (declared > limit) {
+      reject(httpError(413, 'Image is too large'));
+      return;
+    }
+    const chunks = [];
+    let size = 0;
+    req.on('data', (chunk) => {
+      size += chunk.length;
+      if (size > limit) {
+        stopReading(req);
+        reject(httpError(413, 'Image is too large'));
+        return;
+      }
+      chunks.push(chunk);
+    });
+    req.on('end', () => resolve(Buffer.concat(chunks, size)));
+    req.on('error', reject);
+  });
+}
+
+function parsePartHeaders(raw) {
+  const headers = {};
+  for (const line of raw.split('\r\n')) {
+    const idx = line.indexOf(':');
+    if (idx > 0) headers[line.slice(0, idx).trim().toLowerCase()] = line.slice(idx + 1).trim();
+  }
+  const disposition = headers['content-disposition'] || '';
+  const name = /\bname="([^"]*)"/i.exec(disposition);
+  const filename = /\bfilename="([^"]*)"/i.exec(disposition);
+  return {
+    name: name ? name[1] : '',
+    filename: filename ? filename[1] : null,
+    contentType: headers['content-type'] || ''
+  };
+}
+
+// Incremental multipart/form-data parser. Only the unmatched tail of the
+// stream (at most one delimiter long) is held back between chunks, so the
+// file part is collected without buffering the whole body first.
+function readMultipart(req, boundary, limit) {
+  return new Promise((resolve, reject) => {
+    const delimiter = Buffer.from(`\r\n--${boundary}`);
+    const fields = {};
+    let file = null;
+    let part = null;
+    let partChunks = [];
+    let state = 'preamble';
+    // Treat the body as if it began with CRLF so the first boundary matches
+    // the same delimiter as the rest.
+    let buf = Buffer.from('\r\n');
+    let size = 0;
+    let failed = false;
+
+    const fail = (err) => {
+      if (failed) return;
+      failed = true;
+      stopReading(req);
+      reject(err);
+    };
+
+    const finishPart = () => {
+      const data = Buffer.concat(partChunks);
+      partChunks = [];
+      if (part.name === 'image' || part.filename !== null) {
+        if (!file) file = { bytes: data, contentType: part.contentType };
+      } else {
+        fields[part.name] = data.toString('utf8');
+      }
+      part = null;
+    };
+
+    const consume = () => {
+      for (;;) {
+        if (state === 'preamble' || state === 'body') {
+          const idx = buf.indexOf(delimiter);
+          if (idx === -1) {
+            const keep = Math.min(buf.length, delimiter.length - 1);
+            if (state === 'body' && buf.length > keep) partChunks.push(buf.subarray(0, buf.length - keep));
+            buf = buf.subarray(buf.length - keep);
+            return;
+          }
+          if (state === 'body') {
+            partChunks.push(buf.subarray(0, idx));
+            finishPart();
+          }
+          buf = buf.subarray(idx + delimiter.length);
+          state = 'after-boundary';
+        }
+        if (state === 'after-boundary') {
+          if (buf.length < 2) return;
+          if (buf[0] === 0x2d && buf[1] === 0x2d) {
+            state = 'done';
+            return;
+          }
+          state = 'headers';
+        }
+        if (state === 'headers') {
+          const idx = buf.indexOf('\r\n\r\n');
+          if (idx === -1) {
+            if (buf.length > 16 * 1024) fail(httpError(400, 'Malformed multipart body'));
+            return;
+          }
+          part = parsePartHeaders(buf.toString('utf8', 0, idx));
+          buf = buf.subarray(idx + 4);
+          state = 'body';
+        }
+        if (state === 'done') return;
+      }
+    };
+
+    req.on('data', (chunk) => {
+      if (failed) return;
+      size += chunk.length;
+      if (size > limit) {
+        fail(httpError(413, 'Image is too large'));
+        return;
+      }
+      buf = buf.length ? Buffer.concat([buf, chunk]) : chunk;
+      consume();
+    });
+    req.on('end', () => {
+      if (failed) return;
+      if (state !== 'done') {
+        reject(httpError(400, 'Malformed multipart body'));
+        return;
+      }
+      resolve({ fields, file });
+    });
+    req.on('error', (e) => fail(e));
+  });
+}
+
+function encodeBase64(bytes) {
+  const end = timing.span('base64');
+  const content = bytes.toString('base64');
+  end();
+  return content;
+}
+
+function finalize({ bytes, content, mimeType, contentType, model, languageCodes }) {
+  let resolved = (mimeType || '').toString().trim().toUpperCase();
+  if (!resolved) resolved = MIME_TYPES[baseType(contentType || '')] || sniffMimeType(bytes);
+  if (!SUPPORTED_MIME_TYPES.has(resolved)) {
+    throw httpError(415, `Unsupported image type: ${resolved}`);
+  }
+  return {
+    bytes,
+    content: content || encodeBase64(bytes),
+    mimeType: resolved,
+    model: (model || 'page').toString().trim(),
+    languageCodes: parseLanguageCodes(languageCodes)
+  };
+}
+
+async function readImageUpload(req, { limit = MAX_UPLOAD_BYTES } = {}) {
+  const contentType = (req.headers['content-type'] || '').toString();
+  const type = baseType(contentType);
+
+  if (type === 'multipart/form-data') {
+    const boundary = /boundary=(?:"([^"]+)"|([^;]+))/i.exec(contentType);
+    if (!boundary) throw httpError(400, 'multipart boundary is missing');
+    const { fields, file } = await timing.measure('upload', () => readMultipart(req, boundary[1] || boundary[2], limit));
+    if (!file || !file.bytes.length) throw httpError(400, 'image is required');
+    return finalize({
+      bytes: file.bytes,
+      mimeType: fields.mimeType,
+      contentType: file.contentType,
+      model: fields.model,
+      languageCodes: fields.languageCodes
+    });
+  }
+
+  if (type === 'application/octet-stream' || type.startsWith('image/') || type === 'application/pdf') {
+    const bytes = await timing.measure('upload', () => readStream(req, limit));
+    if (!bytes.length) throw httpError(400, 'image is required');
+    const query = queryOf(req);
+    return finalize({
+      bytes,
+      mimeType: query.mimeType,
+      contentType: type === 'application/octet-stream' ? '' : type,
+      model: query.model,
+      languageCodes: query.languageCodes
+    });
+  }
+
+  const body = req.body || {};
+  const content = (body.image || '').toString().trim();
+  if (!content) throw httpError(400, 'image is required');
+  const endDecode = timing.span('base64');
+  const bytes = Buffer.from(content, 'base64');
+  endDecode();
+  if (bytes.length > limit) throw httpError(413, 'Image is too large');
+  return finalize({
+    bytes,
+    content,
+    mimeType: body.mimeType || 'JPEG',
+    model: body.model,
+    languageCodes: body.languageCodes
+  });
+}
+
+module.exports = { readImageUpload, sendUploadError, parseLanguageCodes, MAX_UPLOAD_BYTES };
@@ -0,0 +1,176 @@
+'use strict';
+
+const http = require('http');
+const https = require('https');
+const stats = require('./stats');
+const timing = require('./timing');
+const metrics = require('./metrics');
+
+// Pooled client for upstream APIs (Yandex Vision, Gemini). One keep-alive
+// agent per origin so warm invocations skip the TCP + TLS handshake.
+
+const POOL_OPTIONS = {
+  keepAlive: true,
+  keepAliveMsecs: 1000,
+  maxSockets: Number(process.env.UPSTREAM_MAX_SOCKETS) || 64,
+  maxFreeSockets: Number(process.env.UPSTREAM_MAX_FREE_SOCKETS) || 16,
+  // Idle sockets are destroyed after this long; LIFO scheduling lets the
+  // least recently used ones age out first under light load.
+  timeout: Number(process.env.UPSTREAM_IDLE_TIMEOUT_MS) || 30000,
+  scheduling: 'lifo'
+};
+
+const agents = new Map();
+
+const upstreamRequests = metrics.counter('upstream_requests_total', 'Upstream requests by upstream and status (0 = no response)', ['upstream', 'status']);
+const upstreamDuration = metrics.histogram('upstream_request_duration_seconds', 'Upstream request duration until the body is read', ['upstream']);
+const upstreamTtfb = metrics.histogram('upstream_ttfb_seconds', 'Upstream time to response headers', ['upstream']);
+const upstreamTimeouts = metrics.counter('upstream_timeouts_total', 'Upstream requests that hit the inactivity timeout', ['upstream']);
+
+const counters = {
+  requests: 0,
+  poolHits: 0,
+  poolMisses: 0,
+  tlsResumed: 0,
+  errors: 0,
+  timeouts: 0
+};
+
+function getAgent(u) {
+  const key = `${u.protocol}//${u.host}`;
+  let agent = agents.get(key);
+  if (!agent) {
+    agent = u.protocol === 'http:'
+      ? new http.Agent(POOL_OPTIONS)
+      : new https.Agent({ ...POOL_OPTIONS, maxCachedSessions: 100 });
+    agents.set(key, agent);
+  }
+  return agent;
+}
+
+function trackSocket(req) {
+  req.on('socket', (socket) => {
+    if (req.reusedSocket) {
+      counters.poolHits++;
+      return;
+    }
+    counters.poolMisses++;
+    if (typeof socket.isSessionReused === 'function') {
+      socket.once('secureConnect', () => {
+        if (socket.isSessionReused()) counters.tlsResumed++;
+      });
+    }
+  });
+}
+
+// Sends the request and resolves with the response stream once headers
+// arrive. The timeout is a socket inactivity timeout, so it also bounds
+// stalls while a streamed body is being read. Time to first byte and body
+// download are recorded as `<label>-ttfb` / `<label>-download` spans.
+// Aborting `signal` cancels the request, including a body being read.
+function open(url, {
+  method = 'POST',
+  headers = {},
+  body = null,
+  timeoutMs = 15000,
+  label = 'upstream',
+  signal = null
+} = {}) {
+  return new Promise((resolve, reject) => {
+    const labels = { upstream: label };
+    const endTtfb = timing.span(`${label}-ttfb`);
+    const observeTtfb = upstreamTtfb.startTimer(labels);
+    const observeDuration = upstreamDuration.startTimer(labels);
+    const u = url instanceof URL ? url : new URL(url);
+    const transport = u.protocol === 'http:' ? http : https;
+    const reqHeaders = { ...headers };
+    if (body != null) {
+      reqHeaders['Content-Length'] = Buffer.byteLength(body);
+    }
+
+    counters.requests++;
+    const req = transport.request({
+      method,
+      protocol: u.protocol,
+      hostname: u.hostname,
+      port: u.port || undefined,
+      path: u.pathname + (u.search || ''),
+      headers: reqHeaders,
+      agent: getAgent(u),
+      signal: signal || undefined
+    }, (res) => {
+      endTtfb();
+      observeTtfb();
+      upstreamRequests.inc({ upstream: label, status: res.statusCode });
+      const endDownload = timing.span(`${label}-download`);
+      res.once('end', () => {
+        endDownload();
+        observeDuration();
+      });
+      resolve(res);
+    });
+
+    trackSocket(req);
+
+    req.on('error', (e) => {
+      // Aborted on purpose (e.g. a hedged request that lost the race).
+      if (e.name !== 'AbortError') {
+        counters.errors++;
+        if (!req.res) upstreamRequests.inc({ upstream: label, status: 0 });
+      }
+      reject(e);
+    });
+    req.setTimeout(timeoutMs, () => {
+      counters.timeouts++;
+      upstreamTimeouts.inc(labels);
+      const err = new Error('Upstream timeout');
+      err.code = 'UPSTREAM_TIMEOUT';
+      if (req.res) req.res.destroy(err);
+      req.destroy(err);
+    });
+
+    if (body != null) req.write(body);
+    req.end();
+  });
+}
+
+async function request(url, options = {}) {
+  const res = await open(url, options);
+  return new Promise((resolve, reject) => {
+    let chunks = '';
+    res.setEncoding('utf8');
+    res.on('data', (d) => { chunks += d; });
+    res.on('error', reject);
+    res.on('end', () => {
+      const status = res.statusCode || 0;
+      const ct = (res.headers['content-type'] || '').toString();
+      let json = null;
+      if (ct.includes('application/json')) {
+        const endParse = timing.span(`${options.label || 'upstream'}-parse`);
+        try {
+          json = JSON.parse(chunks || '{}');
+        } catch (e) {
+          json = null;
+        }
+        endParse();
+      }
+      resolve({ status, headers: res.headers, json, raw: chunks });
+    });
+  });
+}
+
+function snapshot() {
+  const pools = {};
+  for (const [origin, agent] of agents) {
+    let active = 0;
+    let idle = 0;
+    for (const list of Object.values(agent.sockets)) active += list.length;
+    for (const list of Object.values(agent.freeSockets)) idle += list.length;
+    pools[origin] = { active, idle };
+  }
+  return { ...counters, pools };
+}
+
+stats.register('upstream', snapshot);
+
+module.exports = { open, request, stats: snapshot };
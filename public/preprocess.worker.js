@@ -0,0 +1,30 @@
+// Downscales and re-encodes label photos off the main thread before upload.
+// Replies with the original file when it is already small enough or the
+// browser cannot decode it here, so the caller can always upload the result.
+
+self.onmessage = async (e) => {
+  const { id, file, maxEdge, quality } = e.data;
+  try {
+    const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+    const scale = Math.min(1, maxEdge / Math.max(bitmap.width, bitmap.height));
+    const width = Math.round(bitmap.width * scale);
+    const height = Math.round(bitmap.height * scale);
+
+    if (scale === 1 && file.type === 'image/jpeg') {
+      bitmap.close();
+      self.postMessage({ id, blob: file, width, height });
+      return;
+    }
+
+    const canvas = new OffscreenCanvas(width, height);
+    const ctx = canvas.getContext('2d');
+    ctx.imageSmoothingQuality = 'high';
+    ctx.drawImage(bitmap, 0, 0, width, height);
+    bitmap.close();
+
+    const blob = await canvas.convertToBlob({ type: 'image/jpeg', quality });
+    self.postMessage({ id, blob: blob.size < file.size ? blob : file, width, height });
+  } catch (err) {
+    self.postMessage({ id, blob: file, error: err.message });
+  }
+};
@@ -0,0 +1,152 @@
+// Local cache of OCR and analysis results in IndexedDB, so a re-scan of the
+// same photo or the same composition renders without the network. OCR
+// results are keyed by the SHA-256 of the prepared image bytes, analyses by
+// the SHA-256 of the normalized composition text. Total size is bounded:
+// the least recently used entries are evicted first. Every method resolves
+// (to null when IndexedDB is unavailable) so callers can treat the store
+// as optional.
+
+const ResultStore = (() => {
+  const DB_NAME = 'labelspy';
+  const DB_VERSION = 1;
+  const MAX_BYTES = 5 * 1024 * 1024;
+  const MAX_ENTRIES = 500;
+  const MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000;
+
+  let dbPromise = null;
+
+  function open() {
+    if (dbPromise) return dbPromise;
+    dbPromise = new Promise((resolve) => {
+      if (typeof indexedDB === 'undefined') {
+        resolve(null);
+        return;
+      }
+      const req = indexedDB.open(DB_NAME, DB_VERSION);
+      req.onupgradeneeded = () => {
+        const db = req.result;
+        const results = db.createObjectStore('results', { keyPath: 'key' });
+        results.createIndex('usedAt', 'usedAt');
+        // Running totals, so a put does not have to scan the store.
+        db.createObjectStore('meta');
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => resolve(null);
+      req.onblocked = () => resolve(null);
+    });
+    return dbPromise;
+  }
+
+  function request(req) {
+    return new Promise((resolve, reject) => {
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  function done(tx) {
+    return new Promise((resolve, reject) => {
+      tx.oncomplete = () => resolve();
+      tx.onerror = () => reject(tx.error);
+      tx.onabort = () => reject(tx.error);
+    });
+  }
+
+  // Null where SubtleCrypto is unavailable (plain-HTTP origins).
+  async function sha256(data) {
+    if (typeof crypto === 'undefined' || !crypto.subtle) return null;
+    const bytes = typeof data === 'string' ? new TextEncoder().encode(data) : data;
+    const digest = await crypto.subtle.digest('SHA-256', bytes);
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  // Same composition, same key: case and whitespace differences from OCR
+  // or editing do not matter.
+  function compositionHash(text) {
+    return sha256(text.toLowerCase().replace(/\s+/g, ' ').trim());
+  }
+
+  async function get(kind, hash) {
+    try {
+      const db = await open();
+      if (!db || !hash) return null;
+      const tx = db.transaction(['results', 'meta'], 'readwrite');
+      const results = tx.objectStore('results');
+      const entry = await request(results.get(`${kind}:${hash}`));
+      if (!entry) return null;
+      if (Date.now() - entry.storedAt > MAX_AGE_MS) {
+        await remove(tx, entry);
+        return null;
+      }
+      entry.usedAt = Date.now();
+      results.put(entry);
+      await done(tx);
+      return entry.value;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  async function totals(meta) {
+    return (await request(meta.get('totals'))) || { bytes: 0, entries: 0 };
+  }
+
+  async function remove(tx, entry) {
+    const meta = tx.objectStore('meta');
+    const t = await totals(meta);
+    tx.objectStore('results').delete(entry.key);
+    meta.put({ bytes: t.bytes - entry.size, entries: t.entries - 1 }, 'totals');
+  }
+
+  async function put(kind, hash, value) {
+    try {
+      const db = await open();
+      if (!db || !hash) return null;
+      const size = new Blob([JSON.stringify(value)]).size;
+      if (size > MAX_BYTES) return null;
+
+      const tx = db.transaction(['results', 'meta'], 'readwrite');
+      const results = tx.objectStore('results');
+      const meta = tx.objectStore('meta');
+      const key = `${kind}:${hash}`;
+      const t = await totals(meta);
+      const previous = await request(results.get(key));
+      if (previous) {
+        t.bytes -= previous.size;
+        t.entries -= 1;
+      }
+      const now = Date.now();
+      results.put({ key, value, size, storedAt: now, usedAt: now });
+      t.bytes += size;
+      t.entries += 1;
+
+      // Evict least recently used entries until back under both limits.
+      if (t.bytes > MAX_BYTES || t.entries > MAX_ENTRIES) {
+        const cursors = results.index('usedAt').openCursor();
+        await new Promise((resolve, reject) => {
+          cursors.onerror = () => reject(cursors.error);
+          cursors.onsuccess = () => {
+            const cursor = cursors.result;
+            if (!cursor || (t.bytes <= MAX_BYTES && t.entries <= MAX_ENTRIES)) {
+              resolve();
+              return;
+            }
+            if (cursor.value.key !== key) {
+              t.bytes -= cursor.value.size;
+              t.entries -= 1;
+              cursor.delete();
+            }
+            cursor.continue();
+          };
+        });
+      }
+      meta.put(t, 'totals');
+      await done(tx);
+      return true;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  return { sha256, compositionHash, get, put };
+})();
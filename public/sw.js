@@ -0,0 +1,72 @@
+// Service worker: precaches the app shell so the page opens offline and
+// on flaky connections. The HTML and other unversioned files are fetched
+// network-first (the cached copy is the fallback); content-hashed files
+// under /assets/ never change, so they are served cache-first. API calls
+// are not intercepted: the page keeps their results in IndexedDB
+// (result-store.js).
+
+// Both lines are rewritten by scripts/build.js with the built file list.
+const CACHE_VERSION = 'dev';
+const PRECACHE_URLS = ['/', '/result-store.js', '/preprocess.worker.js'];
+
+const SHELL_CACHE = `labelspy-shell-${CACHE_VERSION}`;
+
+self.addEventListener('install', (e) => {
+  e.waitUntil(
+    caches.open(SHELL_CACHE)
+      .then((cache) => cache.addAll(PRECACHE_URLS))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', (e) => {
+  e.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(keys
+        .filter((key) => key.startsWith('labelspy-shell-') && key !== SHELL_CACHE)
+        .map((key) => caches.delete(key))))
+      .then(() => self.clients.claim())
+  );
+});
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) return cached;
+  const resp = await fetch(request);
+  if (resp.ok) {
+    const cache = await caches.open(SHELL_CACHE);
+    cache.put(request, resp.clone());
+  }
+  return resp;
+}
+
+async function networkFirst(request, fallbackUrl) {
+  try {
+    const resp = await fetch(request);
+    if (resp.ok) {
+      const cache = await caches.open(SHELL_CACHE);
+      cache.put(fallbackUrl || request, resp.clone());
+    }
+    return resp;
+  } catch (err) {
+    const cached = await caches.match(fallbackUrl || request);
+    if (cached) return cached;
+    throw err;
+  }
+}
+
+self.addEventListener('fetch', (e) => {
+  const { request } = e;
+  if (request.method !== 'GET') return;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin || url.pathname.startsWith('/api/')) return;
+
+  if (request.mode === 'navigate') {
+    // Every route renders the same shell (SPA fallback).
+    e.respondWith(networkFirst(request, '/'));
+  } else if (url.pathname.startsWith('/assets/')) {
+    e.respondWith(cacheFirst(request));
+  } else {
+    e.respondWith(networkFirst(request));
+  }
+});
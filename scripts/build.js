@@ -0,0 +1,93 @@
+'use strict';
+
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const { minifyJs, minifyCss, minifyHtml } = require('./minify');
+const { precompress } = require('./precompress');
+
+// Builds public/ into dist/: the inline <style> and <script> of index.html
+// become minified, content-hashed files under dist/assets/ (served as
+// immutable), the other scripts are hashed the same way, and the remaining
+// HTML shell is minified. The service worker keeps its URL and gets the
+// list of built files to precache. Everything is then precompressed.
+//   node scripts/build.js [outDir]   (default: dist/)
+
+const ROOT = path.join(__dirname, '..');
+const SRC_DIR = path.join(ROOT, 'public');
+const ASSETS = 'assets';
+// Must stay at a fixed URL (and scope) across builds.
+const SERVICE_WORKER = 'sw.js';
+
+function contentHash(data) {
+  return crypto.createHash('sha256').update(data).digest('hex').slice(0, 10);
+}
+
+// Writes data to assets/<name>.<hash><ext> and returns its URL path.
+function emitAsset(outDir, name, ext, data) {
+  const file = `${name}.${contentHash(data)}${ext}`;
+  fs.writeFileSync(path.join(outDir, ASSETS, file), data);
+  return `/${ASSETS}/${file}`;
+}
+
+function extractBlock(html, tag) {
+  const re = new RegExp(`<${tag}>([\\s\\S]*?)</${tag}>`);
+  const match = re.exec(html);
+  if (!match) throw new Error(`No inline <${tag}> in index.html`);
+  return { source: match[1], replace: (replacement) => html.replace(match[0], () => replacement) };
+}
+
+function build(outDir) {
+  fs.rmSync(outDir, { recursive: true, force: true });
+  fs.mkdirSync(path.join(outDir, ASSETS), { recursive: true });
+
+  // Static files other than the page and scripts are copied as-is.
+  for (const entry of fs.readdirSync(SRC_DIR, { withFileTypes: true })) {
+    if (!entry.isFile() || /\.(br|gz)$/.test(entry.name)) continue;
+    if (entry.name === 'index.html' || entry.name.endsWith('.js')) continue;
+    fs.copyFileSync(path.join(SRC_DIR, entry.name), path.join(outDir, entry.name));
+  }
+
+  // Scripts first: the page refers to them by URL.
+  const renames = [];
+  for (const name of fs.readdirSync(SRC_DIR)) {
+    if (!name.endsWith('.js') || name === SERVICE_WORKER) continue;
+    const source = fs.readFileSync(path.join(SRC_DIR, name), 'utf8');
+    renames.push([`/${name}`, emitAsset(outDir, name.slice(0, -3), '.js', minifyJs(source))]);
+  }
+
+  let html = fs.readFileSync(path.join(SRC_DIR, 'index.html'), 'utf8');
+  for (const [from, to] of renames) html = html.split(`"${from}"`).join(`"${to}"`);
+
+  const style = extractBlock(html, 'style');
+  const cssUrl = emitAsset(outDir, 'app', '.css', minifyCss(style.source));
+  html = style.replace(`<link rel="stylesheet" href="${cssUrl}">`);
+
+  const script = extractBlock(html, 'script');
+  let js = script.source;
+  for (const [from, to] of renames) js = js.split(`'${from}'`).join(`'${to}'`);
+  const jsUrl = emitAsset(outDir, 'app', '.js', minifyJs(js));
+  html = script.replace(`<script src="${jsUrl}"></script>`);
+
+  html = minifyHtml(html);
+  fs.writeFileSync(path.join(outDir, 'index.html'), html);
+
+  // A new version (any change to the page) makes browsers install the
+  // worker again and drop the old shell cache.
+  const shell = ['/', cssUrl, jsUrl, ...renames.map(([, to]) => to)];
+  const sw = fs.readFileSync(path.join(SRC_DIR, SERVICE_WORKER), 'utf8')
+    .replace(/const CACHE_VERSION = .*;/, () => `const CACHE_VERSION = '${contentHash(html)}';`)
+    .replace(/const PRECACHE_URLS = .*;/, () => `const PRECACHE_URLS = ${JSON.stringify(shell)};`);
+  fs.writeFileSync(path.join(outDir, SERVICE_WORKER), minifyJs(sw));
+
+  return precompress(outDir);
+}
+
+if (require.main === module) {
+  const outDir = path.resolve(process.argv[2] || path.join(ROOT, 'dist'));
+  for (const { file, raw, br, gz } of build(outDir)) {
+    console.log(`${file}: ${raw} B, br ${br ?? '-'} B, gzip ${gz ?? '-'} B`);
+  }
+}
+
+module.exports = { build };
@@ -0,0 +1,247 @@
+'use strict';
+
+// Conservative, dependency-free minifiers for the build. They drop
+// comments and insignificant whitespace and never rename or reorder code:
+// strings, template literals and regex literals are copied verbatim, and a
+// line break is kept wherever automatic semicolon insertion might rely on
+// it.
+
+const IDENT_RE = /[A-Za-z0-9_$\u0080-￿]/;
+
+// A `/` after one of these (or after a keyword below) starts a regex
+// literal; anywhere else it is division.
+const REGEX_PREFIX = new Set('(,=:[!&|?{};+-*%<>~^'.split(''));
+const REGEX_KEYWORDS = new Set([
+  'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+  'void', 'throw', 'instanceof', 'yield', 'await'
+]);
+
+// A line break right after these, or right before the second set, can
+// never end a statement.
+const JOIN_AFTER = new Set('{([,;:=&|?*%<>!~^'.split(''));
+const JOIN_BEFORE = new Set('})],;.:?='.split(''));
+
+function isIdent(ch) {
+  return ch !== undefined && ch !== '' && IDENT_RE.test(ch);
+}
+
+function minifyJs(src) {
+  let out = '';
+  let i = 0;
+  const n = src.length;
+  // `{` depths at which an enclosing template literal resumes.
+  const templateDepths = [];
+  let depth = 0;
+  // Whitespace seen since the last emitted token: '', ' ' or '\n'.
+  let pending = '';
+  let lastWord = '';
+
+  const last = () => out[out.length - 1];
+
+  const flushSpace = (next) => {
+    if (!pending || !out) {
+      pending = '';
+      return;
+    }
+    const prev = last();
+    if (pending === '\n' && !JOIN_AFTER.has(prev) && !JOIN_BEFORE.has(next)) {
+      out += '\n';
+    } else if ((isIdent(prev) && isIdent(next)) || ((prev === '+' || prev === '-') && prev === next)) {
+      out += ' ';
+    }
+    pending = '';
+  };
+
+  const emit = (text) => {
+    flushSpace(text[0]);
+    out += text;
+  };
+
+  // Copies a template literal chunk starting after ` or }, up to and
+  // including the closing ` or ${.
+  const scanTemplate = () => {
+    let start = i;
+    while (i < n) {
+      const ch = src[i];
+      if (ch === '\\') {
+        i += 2;
+      } else if (ch === '`') {
+        i++;
+        out += src.slice(start, i);
+        return;
+      } else if (ch === '$' && src[i + 1] === '{') {
+        i += 2;
+        out += src.slice(start, i);
+        depth++;
+        templateDepths.push(depth);
+        return;
+      } else {
+        i++;
+      }
+    }
+    out += src.slice(start);
+  };
+
+  while (i < n) {
+    const ch = src[i];
+    const next = src[i + 1];
+
+    if (ch === ' ' || ch === '\t' || ch === '\r' || ch === '\n' || ch === '\f' || ch === '\v') {
+      if (ch === '\n') pending = '\n';
+      else if (!pending) pending = ' ';
+      i++;
+      continue;
+    }
+
+    if (ch === '/' && next === '/') {
+      while (i < n && src[i] !== '\n') i++;
+      continue;
+    }
+    if (ch === '/' && next === '*') {
+      const end = src.indexOf('*/', i + 2);
+      const stop = end === -1 ? n : end + 2;
+      const comment = src.slice(i, stop);
+      if (comment.includes('\n')) pending = '\n';
+      else if (!pending) pending = ' ';
+      i = stop;
+      continue;
+    }
+
+    if (ch === '"' || ch === "'") {
+      let j = i + 1;
+      while (j < n && src[j] !== ch) j += src[j] === '\\' ? 2 : 1;
+      emit(src.slice(i, j + 1));
+      i = j + 1;
+      lastWord = '';
+      continue;
+    }
+
+    if (ch === '`') {
+      flushSpace('`');
+      out += '`';
+      i++;
+      scanTemplate();
+      lastWord = '';
+      continue;
+    }
+
+    if (ch === '/') {
+      flushSpace('/');
+      const prev = last();
+      const regex = prev === undefined || REGEX_PREFIX.has(prev) || REGEX_KEYWORDS.has(lastWord);
+      if (regex) {
+        let j = i + 1;
+        let inClass = false;
+        while (j < n) {
+          const c = src[j];
+          if (c === '\\') {
+            j += 2;
+            continue;
+          }
+          if (c === '[') inClass = true;
+          else if (c === ']') inClass = false;
+          else if (c === '/' && !inClass) break;
+          j++;
+        }
+        j++;
+        while (j < n && isIdent(src[j])) j++;
+        out += src.slice(i, j);
+        i = j;
+        lastWord = '';
+        continue;
+      }
+      out += '/';
+      i++;
+      lastWord = '';
+      continue;
+    }
+
+    if (isIdent(ch)) {
+      let j = i + 1;
+      while (j < n && isIdent(src[j])) j++;
+      const word = src.slice(i, j);
+      emit(word);
+      i = j;
+      lastWord = word;
+      continue;
+    }
+
+    if (ch === '{') {
+      depth++;
+    } else if (ch === '}') {
+      if (templateDepths.length && templateDepths[templateDepths.length - 1] === depth) {
+        templateDepths.pop();
+        depth--;
+        flushSpace('}');
+        out += '}';
+        i++;
+        scanTemplate();
+        lastWord = '';
+        continue;
+      }
+      depth--;
+    }
+    emit(ch);
+    i++;
+    lastWord = '';
+  }
+  return out.trim();
+}
+
+function minifyCss(src) {
+  let out = '';
+  let i = 0;
+  const n = src.length;
+  let pending = false;
+
+  while (i < n) {
+    const ch = src[i];
+    if (ch === '/' && src[i + 1] === '*') {
+      const end = src.indexOf('*/', i + 2);
+      i = end === -1 ? n : end + 2;
+      pending = true;
+      continue;
+    }
+    if (/\s/.test(ch)) {
+      pending = true;
+      i++;
+      continue;
+    }
+    if (ch === '"' || ch === "'") {
+      let j = i + 1;
+      while (j < n && src[j] !== ch) j += src[j] === '\\' ? 2 : 1;
+      if (pending && out && !/[{};,>]$/.test(out)) out += ' ';
+      out += src.slice(i, j + 1);
+      pending = false;
+      i = j + 1;
+      continue;
+    }
+    // Spaces around these are insignificant; a space before `:` is kept
+    // because `a :hover` and `a:hover` differ.
+    if ('{};,>'.includes(ch)) {
+      if (ch === '}' && out.endsWith(';')) out = out.slice(0, -1);
+      out += ch;
+      pending = false;
+      i++;
+      continue;
+    }
+    if (pending && out && !/[{};,>:]$/.test(out)) out += ' ';
+    pending = false;
+    out += ch;
+    i++;
+  }
+  return out.trim();
+}
+
+// Strips indentation, blank lines and comments. Safe as long as no <pre>
+// or <textarea> has text content in the source.
+function minifyHtml(src) {
+  return src
+    .replace(/<!--(?!\[)[\s\S]*?-->/g, '')
+    .split('\n')
+    .map((line) => line.trim())
+    .filter(Boolean)
+    .join('\n');
+}
+
+module.exports = { minifyJs, minifyCss, minifyHtml };
@@ -0,0 +1,66 @@
+'use strict';
+
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+
+// Writes <file>.br and <file>.gz next to every compressible static asset,
+// at maximum compression, so the server can send them as-is instead of
+// compressing at request time. Run by scripts/build.js on dist/; also
+// usable alone:
+//   node scripts/precompress.js [dir]   (default: public/)
+
+const EXTENSIONS = new Set(['.html', '.js', '.css', '.json', '.svg', '.webmanifest', '.txt', '.xml']);
+
+const VARIANTS = [
+  {
+    ext: '.br',
+    compress: (buf) => zlib.brotliCompressSync(buf, {
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+        [zlib.constants.BROTLI_PARAM_SIZE_HINT]: buf.length
+      }
+    })
+  },
+  { ext: '.gz', compress: (buf) => zlib.gzipSync(buf, { level: zlib.constants.Z_BEST_COMPRESSION }) }
+];
+
+function walk(dir) {
+  const files = [];
+  for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+    const file = path.join(dir, entry.name);
+    if (entry.isDirectory()) files.push(...walk(file));
+    else if (EXTENSIONS.has(path.extname(entry.name))) files.push(file);
+  }
+  return files;
+}
+
+function precompress(dir) {
+  const results = [];
+  for (const file of walk(dir)) {
+    const source = fs.readFileSync(file);
+    const sizes = { file: path.relative(dir, file), raw: source.length };
+    for (const variant of VARIANTS) {
+      const target = file + variant.ext;
+      const encoded = variant.compress(source);
+      // Not worth a variant (and a Content-Encoding) if it does not shrink.
+      if (encoded.length >= source.length) {
+        fs.rmSync(target, { force: true });
+        continue;
+      }
+      fs.writeFileSync(target, encoded);
+      sizes[variant.ext.slice(1)] = encoded.length;
+    }
+    results.push(sizes);
+  }
+  return results;
+}
+
+if (require.main === module) {
+  const dir = path.resolve(process.argv[2] || path.join(__dirname, '..', 'public'));
+  for (const { file, raw, br, gz } of precompress(dir)) {
+    console.log(`${file}: ${raw} B, br ${br ?? '-'} B, gzip ${gz ?? '-'} B`);
+  }
+}
+
+module.exports = { precompress };